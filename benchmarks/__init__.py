@@ -0,0 +1,4 @@
+# Standalone performance scripts, run as modules from the repo root:
+#     python -m benchmarks.bench_pnl
+#     python -m benchmarks.bench_pdf
+#     python -m benchmarks.bench_helpers   (baselines in benchmarks/baselines/)
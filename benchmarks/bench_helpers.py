@@ -0,0 +1,171 @@
+"""
+Estimator hot-path micro-benchmarks: time and peak memory for each
+utils.helpers function, compared against stored baselines.
+
+    python -m benchmarks.bench_helpers                    # compare with benchmarks/baselines/helpers.json
+    python -m benchmarks.bench_helpers --update           # record new baselines
+    python -m benchmarks.bench_helpers --sizes 1 100 --only create_item_dataframe create_pdf
+
+Estimates come from benchmarks.synthetic.estimate_case (1 to 5,000 items,
+mixed units, new and legacy labor formats). Inputs are prepared outside the
+timed call, the way the estimator holds them.
+
+Exits 1 when a case got slower than its baseline by more than --tolerance or
+allocates more than --mem-tolerance, so it can gate a deploy. Timings depend
+on the machine: record baselines on the machine that runs the check.
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.synthetic import LABOR_FORMATS, SETTINGS, estimate_case
+from utils import helpers
+
+SIZES = (1, 10, 100, 1_000, 5_000)
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "helpers.json")
+MIN_TIME = 0.2       # seconds of timed calls per case (never fewer than MIN_RUNS calls)
+MIN_RUNS = 3
+ABS_FLOOR_MS = 0.05  # slowdowns smaller than this are noise, whatever the ratio
+ABS_FLOOR_KIB = 16
+
+# Every margin shape normalize_margins() accepts, including bad input
+MARGIN_INPUTS = [15, "20", None, {"profit_margin": 25}, {"part_margin": 15}, 12.5, "bad", {}] * 125
+
+
+def _normalize_all(inputs):
+    for m in inputs:
+        helpers.normalize_margins(m, SETTINGS)
+
+
+def cases(sizes=SIZES, labor_formats=LABOR_FORMATS):
+    """Yields (helper, variant, n, fn); fn runs the helper once on prepared inputs."""
+    yield "normalize_margins", "mixed", len(MARGIN_INPUTS), functools.partial(_normalize_all, MARGIN_INPUTS)
+
+    for labor in labor_formats:
+        for n in sizes:
+            est = estimate_case(n, labor)
+            margins = est.get("margins", est.get("profit_margin"))
+            records = helpers.create_item_dataframe(est["items"]).to_dict("records")
+            calc = functools.partial(
+                helpers.calculate_estimate_details, records, est["days"], margins, SETTINGS,
+                welders=est.get("welders", 0), helpers=est.get("helpers", 0), labor_details=est.get("labor_details"))
+            d = calc()
+            items = [helpers.derive_item_fields(r) for r in records]
+            mm = 1 + helpers.normalize_margins(margins, SETTINGS) / 100.0
+            sold = [{**i, "Total Price": i["Total Price"] * mm} for i in items]
+            labor_cost = d["labor_actual_cost"]
+
+            yield "create_item_dataframe", labor, n, functools.partial(helpers.create_item_dataframe, est["items"])
+            # What each estimator cell edit costs: one edited Qty folded into the editor's rows
+            yield "apply_editor_changes", labor, n, functools.partial(
+                helpers.apply_editor_changes, items, {"edited_rows": {n // 2: {"Qty": 3}}})
+            yield "calculate_estimate_details", labor, n, calc
+            yield "create_pdf", labor, n, functools.partial(
+                helpers.create_pdf, "Bench Client", items, est["days"], labor_cost, d["bill_amount"], d["advance_amount"])
+            yield "create_internal_pdf", labor, n, functools.partial(
+                helpers.create_internal_pdf, "Bench Client", sold, est["days"], labor_cost, labor_cost * mm,
+                d["bill_amount"], d["total_profit"])
+            yield "create_order_pdf", labor, n, functools.partial(helpers.create_order_pdf, "Bench Client", items)
+
+
+def time_call(fn, min_time=MIN_TIME, min_runs=MIN_RUNS):
+    """Median and best ms per call, after one warm-up call."""
+    fn()
+    runs = []
+    deadline = time.perf_counter() + min_time
+    while len(runs) < min_runs or time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        fn()
+        runs.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(runs), min(runs), len(runs)
+
+
+def peak_kib(fn):
+    """Peak Python allocation (KiB) during one call; measured apart from timing, tracemalloc slows calls down."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def load_baselines(path=BASELINE_PATH):
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return {"meta": {}, "cases": {}}
+
+
+def save_baselines(results, path=BASELINE_PATH):
+    """Merges `results` into the baseline file (cases that were not run keep their old baseline)."""
+    data = load_baselines(path)
+    data["meta"] = {"updated": datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(), "machine": platform.platform()}
+    data["cases"].update({key: {"ms": r["ms"], "peak_kib": r["peak_kib"]} for key, r in results.items()})
+    data["cases"] = dict(sorted(data["cases"].items()))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=2)
+        fh.write("\n")
+
+
+def compare(result, base, tolerance, mem_tolerance):
+    """Status of one case against its baseline: "new", "ok", "SLOWER", "MEMORY" or "SLOWER+MEMORY"."""
+    if base is None:
+        return "new"
+    slower = result["ms"] > base["ms"] * (1 + tolerance) and result["ms"] - base["ms"] > ABS_FLOOR_MS
+    bigger = (result["peak_kib"] > base["peak_kib"] * (1 + mem_tolerance)
+              and result["peak_kib"] - base["peak_kib"] > ABS_FLOOR_KIB)
+    return "+".join(s for s, bad in (("SLOWER", slower), ("MEMORY", bigger)) if bad) or "ok"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="items per estimate")
+    parser.add_argument("--labor", nargs="+", default=list(LABOR_FORMATS), choices=LABOR_FORMATS)
+    parser.add_argument("--only", nargs="+", help="helper names to run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = +25%%)")
+    parser.add_argument("--mem-tolerance", type=float, default=0.10, help="allowed peak-memory growth vs baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update", action="store_true", help="write these results as the new baselines")
+    args = parser.parse_args(argv)
+
+    baselines = load_baselines(args.baseline)["cases"]
+    results, failed = {}, []
+    print(f"{'helper':<28} {'variant':>7} {'n':>6} {'median ms':>10} {'best ms':>9} {'runs':>5} "
+          f"{'base ms':>9} {'Δ%':>7} {'peak KiB':>9} {'base KiB':>9}  status")
+    for helper, variant, n, fn in cases(args.sizes, args.labor):
+        if args.only and helper not in args.only:
+            continue
+        key = f"{helper}/{variant}/{n}"
+        median, best, runs = time_call(fn)
+        result = results[key] = {"ms": median, "peak_kib": peak_kib(fn)}
+        base = baselines.get(key)
+        status = compare(result, base, args.tolerance, args.mem_tolerance)
+        if status not in ("ok", "new"):
+            failed.append(key)
+        delta = f"{(median / base['ms'] - 1) * 100:+.0f}" if base and base["ms"] else "-"
+        print(f"{helper:<28} {variant:>7} {n:>6} {median:>10.3f} {best:>9.3f} {runs:>5} "
+              f"{base['ms'] if base else float('nan'):>9.3f} {delta:>7} {result['peak_kib']:>9.1f} "
+              f"{base['peak_kib'] if base else float('nan'):>9.1f}  {status}")
+
+    if args.update:
+        save_baselines(results, args.baseline)
+        print(f"\nBaselines updated: {args.baseline} ({len(results)} cases)")
+        return 0
+    if failed:
+        print(f"\n{len(failed)} regression(s): " + ", ".join(failed))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,60 @@
+"""
+PDF rendering micro-benchmark: 1-item and 1,000-item estimates.
+
+    python -m benchmarks.bench_pdf
+    python -m benchmarks.bench_pdf --items 1 100 1000 --docs 20
+
+"fresh" builds a new PDFGenerator per document (create_pdf & co.);
+"reused" renders the whole batch with one generator (helpers.render_pdfs).
+"""
+import argparse
+import random
+import time
+
+from benchmarks.synthetic import SETTINGS, make_estimate
+from utils import helpers
+
+
+def estimate_jobs(n_items, docs, seed=11):
+    rng = random.Random(seed)
+    jobs = []
+    for _ in range(docs):
+        est = make_estimate(rng, n_items=n_items)
+        d = helpers.calculate_saved_estimate(est, SETTINGS)
+        items = [helpers.derive_item_fields(i) for i in est['items']]
+        jobs.append([
+            ("estimate", ("Bench Client", items, est['days'], d['labor_actual_cost'], d['bill_amount'], d['advance_amount']), {}),
+            ("internal", ("Bench Client", items, est['days'], d['labor_actual_cost'], d['labor_actual_cost'], d['bill_amount'], d['total_profit']), {}),
+            ("order", ("Bench Client", items), {}),
+        ])
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[1, 1000])
+    parser.add_argument("--docs", type=int, default=10, help="estimates per size")
+    args = parser.parse_args(argv)
+
+    print(f"{'items':>6} {'kind':>9} {'fresh ms/doc':>13} {'reused ms/doc':>14} {'KiB':>8}")
+    for n in args.items:
+        jobs = estimate_jobs(n, args.docs)
+        for k, kind in enumerate(helpers.PDF_METHODS):
+            batch = [j[k] for j in jobs]
+
+            t0 = time.perf_counter()
+            for _, a, kw in batch:
+                size = len(helpers.PDF_RENDERERS[kind](*a, **kw))
+            fresh = (time.perf_counter() - t0) * 1000 / len(batch)
+
+            t0 = time.perf_counter()
+            for _ in helpers.render_pdfs(batch):
+                pass
+            reused = (time.perf_counter() - t0) * 1000 / len(batch)
+
+            print(f"{n:>6} {kind:>9} {fresh:>13.2f} {reused:>14.2f} {size / 1024:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
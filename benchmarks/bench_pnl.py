@@ -0,0 +1,100 @@
+"""
+P&L engine scaling, 100 -> 100k closed projects.
+
+    python -m benchmarks.bench_pnl                   # vectorized engine only
+    python -m benchmarks.bench_pnl --legacy 10000    # also time the old iterrows loops up to N rows
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import SETTINGS, make_projects
+from utils import helpers, pnl
+
+SIZES = (100, 1_000, 10_000, 100_000)
+
+
+def legacy_pnl(projects, settings, material_spend=0.0):
+    """
+    The P&L tab before the vectorized engine: iterrows passes that replay every
+    closed estimate through calculate_estimate_details (up to three times per
+    row), kept verbatim for comparison.
+    """
+    df = pd.DataFrame(projects)
+    closed_df = df[df['status'].isin(["Work Done", "Closed"])]
+    total_collected = df['final_settlement_amount'].fillna(0).sum()
+
+    total_quoted = 0.0
+    for idx, row in closed_df.iterrows():
+        est = row.get('internal_estimate')
+        if est:
+            try:
+                am_normalized = helpers.normalize_margins(est.get('margins'), settings)
+                calc = helpers.calculate_estimate_details(est.get('items', []), est.get('days', 1.0), am_normalized, settings)
+                total_quoted += calc["rounded_grand_total"]
+            except: pass
+
+    total_labor = 0.0
+    daily_labor_cost = float(settings.get('daily_labor_cost', 1000.0))
+    for idx, row in closed_df.iterrows():
+        est = row.get('internal_estimate')
+        if est:
+            total_labor += float(est.get('days', 0.0)) * daily_labor_cost
+
+    pl_data = []
+    for idx, row in closed_df.iterrows():
+        est = row.get('internal_estimate')
+        actual_rev = float(row.get('final_settlement_amount') or 0.0)
+        c_name = row.get('clients', {}).get('name', 'Unknown') if isinstance(row.get('clients'), dict) else "Unknown"
+        if actual_rev == 0 and est:
+            try:
+                am_normalized = helpers.normalize_margins(est.get('margins'), settings)
+                calc = helpers.calculate_estimate_details(est.get('items', []), est.get('days', 1.0), am_normalized, settings)
+                actual_rev = calc["rounded_grand_total"]
+            except: pass
+        est_cost = est_profit = mat_cost = labor_cost = 0.0
+        if est:
+            try:
+                am_normalized = helpers.normalize_margins(est.get('margins'), settings)
+                calc = helpers.calculate_estimate_details(est.get('items', []), est.get('days', 1.0), am_normalized, settings)
+                mat_cost = sum([float(i.get('Qty', 0)) * float(i.get('Base Rate', 0)) for i in est.get('items', [])])
+                labor_cost = calc["labor_actual_cost"]
+                est_cost = mat_cost + labor_cost
+                est_profit = actual_rev - est_cost
+            except: pass
+        pl_data.append({"Client": c_name, "Revenue": actual_rev, "Cost": est_cost, "Profit": est_profit,
+                        "Material Cost": mat_cost, "Labor Cost": labor_cost, "created_at": row.get('created_at')})
+    return total_collected, total_quoted, total_labor, pd.DataFrame(pl_data)
+
+
+def timed(fn, *args, repeat=3, **kwargs):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="closed project counts")
+    parser.add_argument("--legacy", type=int, default=0, help="time the iterrows version up to this many rows")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'closed':>8} {'engine ms':>10} {'legacy ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        rows = make_projects(n, closed_share=1.0)
+        eng = timed(pnl.compute_pnl, rows, SETTINGS, 0.0, repeat=args.repeat)
+        if n <= args.legacy:
+            leg = timed(legacy_pnl, rows, SETTINGS, repeat=1)
+            print(f"{n:>8} {eng:>10.1f} {leg:>10.1f} {leg / eng:>7.1f}x")
+        else:
+            print(f"{n:>8} {eng:>10.1f} {'-':>10} {'-':>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
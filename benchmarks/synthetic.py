@@ -0,0 +1,95 @@
+import random
+from datetime import datetime, timedelta
+
+# ---------------------------
+# SYNTHETIC DATA
+# ---------------------------
+# Deterministic (seeded) rows shaped like the real tables, for benchmarks.
+
+SETTINGS = {'profit_margin': 15, 'advance_percentage': 10.0, 'daily_labor_cost': 1000.0,
+            'welder_daily_rate': 500.0, 'helper_daily_rate': 300.0}
+STATUSES = ["Estimate Given", "Order Received", "Work In Progress", "Work Done", "Closed"]
+UNITS = ["pcs", "kg", "ft", "m", "nos"]
+
+
+def make_estimate(rng, n_items=8, legacy_labor=False):
+    items = [{
+        "Item": f"Item {rng.randrange(500)}",
+        "Qty": rng.randint(1, 50),
+        "Base Rate": round(rng.uniform(5, 2500), 2),
+        "Unit": rng.choice(UNITS),
+    } for _ in range(n_items)]
+    est = {"items": items, "days": rng.randint(1, 20), "profit_margin": rng.choice([10, 15, 20, 25])}
+    if legacy_labor:
+        est.update(welders=rng.randint(0, 3), helpers=rng.randint(0, 4))
+    else:
+        est["labor_details"] = [{"role": r, "count": rng.randint(0, 3), "rate": rate}
+                                for r, rate in (("Welder", 500.0), ("Helper", 300.0))]
+    return est
+
+
+LABOR_FORMATS = ("new", "legacy")
+COUNTED_UNITS = ("pcs", "nos")
+
+
+def estimate_case(n_items, labor="new", seed=2024):
+    """
+    Estimate with exactly n_items, identical on every run for the same arguments.
+    Units are mixed: counted units get whole quantities, lengths and weights
+    fractional ones. labor="legacy" uses the old welders/helpers fields, a dict
+    margin and lowercase item keys (item / base_rate / unit) on every third item.
+    """
+    rng = random.Random(f"{seed}:{n_items}:{labor}")
+    legacy = labor == "legacy"
+    items = []
+    for i in range(n_items):
+        unit = UNITS[i % len(UNITS)]
+        qty = rng.randint(1, 50) if unit in COUNTED_UNITS else round(rng.uniform(0.5, 120.0), 2)
+        rate = round(rng.uniform(5, 2500), 2)
+        if legacy and i % 3 == 0:
+            items.append({"item": f"Item {i}", "Qty": qty, "base_rate": rate, "unit": unit})
+        else:
+            items.append({"Item": f"Item {i}", "Qty": qty, "Base Rate": rate, "Unit": unit})
+
+    est = {"items": items, "days": rng.randint(1, 20)}
+    margin = rng.choice([10, 15, 20, 25])
+    if legacy:
+        est.update(welders=rng.randint(0, 3), helpers=rng.randint(0, 4), margins={"profit_margin": margin})
+    else:
+        est["profit_margin"] = margin
+        est["labor_details"] = [{"role": r, "count": rng.randint(0, 3), "rate": rate}
+                                for r, rate in (("Welder", 500.0), ("Helper", 300.0))]
+    return est
+
+
+def make_projects(n, seed=7, closed_share=0.6, persisted_share=0.7, settings=SETTINGS):
+    """
+    n project rows (get_projects() shape). `persisted_share` of them carry
+    est_* columns; the rest only have internal_estimate and must be replayed.
+    """
+    from utils import helpers
+
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1)
+    rows = []
+    for i in range(n):
+        est = make_estimate(rng, n_items=rng.randint(1, 20), legacy_labor=rng.random() < 0.2)
+        closed = rng.random() < closed_share
+        row = {
+            "id": i + 1,
+            "client_id": rng.randrange(1, max(2, n // 3)),
+            "clients": {"name": f"Client {rng.randrange(max(2, n // 3))}"},
+            "status": rng.choice(STATUSES[3:] if closed else STATUSES[:3]),
+            "internal_estimate": est,
+            "final_settlement_amount": float(rng.randint(10_000, 500_000)) if closed and rng.random() < 0.8 else None,
+            "created_at": (start + timedelta(hours=rng.randrange(24 * 900))).isoformat(),
+        }
+        row.update({col: None for col in helpers.ESTIMATE_SUMMARY_COLUMNS})
+        rows.append(row)
+
+    persisted = [r for r in rows if rng.random() < persisted_share]
+    if persisted:
+        batch = helpers.calculate_estimates_batch([r["internal_estimate"] for r in persisted], settings)
+        for row, d in zip(persisted, batch.to_dict('records')):
+            row.update(helpers.estimate_summary_columns(d))
+    return rows
@@ -7,7 +7,7 @@ CREATE TABLE public.clients (
   phone text,
   address text,
   status text DEFAULT 'Active'::text,
-  created_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP,
+  created_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP,
   start_date date,
   internal_estimate jsonb, -- {items: [], days: int, welders: int, helpers: int, profit_margin: int}
   client_estimate jsonb,
@@ -17,6 +17,7 @@ CREATE TABLE public.clients (
   measurements text,
   image_urls ARRAY DEFAULT '{}'::text[],
   projects jsonb DEFAULT '[]'::jsonb,
+  updated_at timestamp with time zone NOT NULL DEFAULT clock_timestamp(),
   CONSTRAINT clients_pkey PRIMARY KEY (id)
 );
 CREATE TABLE public.inventory (
@@ -28,6 +29,33 @@ CREATE TABLE public.inventory (
   dimension text,
   CONSTRAINT inventory_pkey PRIMARY KEY (id)
 );
+CREATE TABLE public.project_types (
+  id bigint GENERATED ALWAYS AS IDENTITY NOT NULL,
+  type_name text NOT NULL,
+  CONSTRAINT project_types_pkey PRIMARY KEY (id)
+);
+CREATE TABLE public.projects (
+  id bigint GENERATED ALWAYS AS IDENTITY NOT NULL,
+  client_id integer,
+  project_type_id bigint,
+  status text DEFAULT 'Draft'::text,
+  measurements text,
+  visit_date date,
+  site_photos jsonb DEFAULT '[]'::jsonb,
+  internal_estimate jsonb, -- {items: [], days: float, labor_details: [], profit_margin: int}
+  est_material_cost numeric, -- est_* = totals computed by the Estimator on save (see utils/backfill.py)
+  est_labor_cost numeric,
+  est_bill_amount numeric,
+  est_advance_amount numeric,
+  est_profit numeric,
+  assigned_staff jsonb DEFAULT '[]'::jsonb,
+  final_settlement_amount numeric,
+  created_at timestamp with time zone NOT NULL DEFAULT now(),
+  updated_at timestamp with time zone NOT NULL DEFAULT clock_timestamp(),
+  CONSTRAINT projects_pkey PRIMARY KEY (id),
+  CONSTRAINT projects_client_id_fkey FOREIGN KEY (client_id) REFERENCES public.clients(id),
+  CONSTRAINT projects_project_type_id_fkey FOREIGN KEY (project_type_id) REFERENCES public.project_types(id)
+);
 CREATE TABLE public.purchase_log (
   id bigint GENERATED ALWAYS AS IDENTITY NOT NULL,
   created_at timestamp with time zone DEFAULT now(),
@@ -59,6 +87,7 @@ CREATE TABLE public.staff (
 );
 CREATE TABLE public.staff_roles (
   role_name text NOT NULL,
+  default_salary numeric DEFAULT 0,
   CONSTRAINT staff_roles_pkey PRIMARY KEY (role_name)
 );
 CREATE TABLE public.supplier_purchases (
@@ -87,3 +116,62 @@ CREATE TABLE public.users (
   recovery_key text NOT NULL,
   CONSTRAINT users_pkey PRIMARY KEY (username)
 );
+
+-- ---------------------------
+-- DELTA SYNC (app caches fetch only rows with updated_at past their watermark)
+-- ---------------------------
+CREATE OR REPLACE FUNCTION public.touch_updated_at() RETURNS trigger AS $$
+BEGIN
+  NEW.updated_at = clock_timestamp();
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER clients_touch BEFORE UPDATE ON public.clients
+  FOR EACH ROW EXECUTE FUNCTION public.touch_updated_at();
+CREATE TRIGGER projects_touch BEFORE UPDATE ON public.projects
+  FOR EACH ROW EXECUTE FUNCTION public.touch_updated_at();
+CREATE INDEX clients_updated_at_idx ON public.clients (updated_at);
+CREATE INDEX projects_updated_at_idx ON public.projects (updated_at);
+-- Keyset pagination (created_at, id): each page is an index range scan, whatever its depth.
+-- created_at must be NOT NULL: a NULL row drops out of every page range, and
+-- DESC sorts NULLs first, where the next cursor cannot compare against them.
+-- Existing databases: backfill, then add the constraint.
+UPDATE public.clients SET created_at = updated_at WHERE created_at IS NULL;
+UPDATE public.projects SET created_at = updated_at WHERE created_at IS NULL;
+ALTER TABLE public.clients ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE public.projects ALTER COLUMN created_at SET NOT NULL;
+CREATE INDEX clients_created_id_idx ON public.clients (created_at DESC, id DESC);
+CREATE INDEX projects_created_id_idx ON public.projects (created_at DESC, id DESC);
+
+-- ---------------------------
+-- SPEND AGGREGATION (called via supabase.rpc; SQLite equivalent lives in utils/repository.py)
+-- ---------------------------
+CREATE OR REPLACE FUNCTION public.purchase_spend_summary(top_n integer DEFAULT 5)
+RETURNS json LANGUAGE sql STABLE AS $$
+  SELECT json_build_object(
+    'total_spend', COALESCE((SELECT SUM(cost) FROM public.supplier_purchases), 0),
+    'top_suppliers', COALESCE((
+      SELECT json_agg(t) FROM (
+        SELECT sp.supplier_id, s.name AS supplier_name, SUM(sp.cost) AS cost
+        FROM public.supplier_purchases sp
+        JOIN public.suppliers s ON s.id = sp.supplier_id
+        GROUP BY sp.supplier_id, s.name
+        ORDER BY SUM(sp.cost) DESC NULLS LAST
+        LIMIT top_n
+      ) t), '[]'::json),
+    'monthly', COALESCE((
+      SELECT json_agg(m ORDER BY m.month) FROM (
+        SELECT to_char(purchase_date, 'YYYY-MM') AS month, SUM(cost) AS cost
+        FROM public.supplier_purchases
+        WHERE purchase_date IS NOT NULL
+        GROUP BY 1
+      ) m), '[]'::json)
+  );
+$$;
+CREATE INDEX supplier_purchases_supplier_id_idx ON public.supplier_purchases (supplier_id);
+
+-- Migration for existing databases (then run: python -m utils.backfill)
+-- ALTER TABLE public.projects
+--   ADD COLUMN est_material_cost numeric, ADD COLUMN est_labor_cost numeric, ADD COLUMN est_bill_amount numeric,
+--   ADD COLUMN est_advance_amount numeric, ADD COLUMN est_profit numeric;
@@ -0,0 +1,173 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils import cache, repository
+from utils.shared_cache import SQLiteSharedTier
+
+
+@pytest.fixture
+def tier():
+    t = SQLiteSharedTier(":memory:")
+    cache.set_shared_tier(t)
+    yield t
+    cache.set_shared_tier(None)
+
+
+def test_raising_fetch_releases_lease_and_runs_once(tier):
+    calls = []
+
+    def boom(x):
+        calls.append(x)
+        raise ValueError("query failed")
+
+    cf = cache.CachedFunction(boom)
+    with pytest.raises(ValueError):
+        cf(1)
+    assert calls == [1]  # no second, local attempt
+    assert tier.acquire_lease(cf.name, cf._key((1,), {}))  # lease was released
+
+
+def test_tier_errors_fall_back_to_local_fetch(tier, monkeypatch):
+    def down(*args, **kwargs):
+        raise OSError("tier unreachable")
+
+    monkeypatch.setattr(tier, "version", down)
+    cf = cache.CachedFunction(lambda x: x * 2)
+    assert cf(21) == 42
+
+
+# --- CachedFunction (process-local) ---
+
+def counting(fn):
+    calls = []
+
+    def wrapped(*args):
+        calls.append(args)
+        return fn(*args)
+    wrapped.calls = calls
+    return wrapped
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_single_flight_concurrent_misses_fetch_once():
+    gate = threading.Event()
+
+    def slow(x):
+        gate.wait(1)
+        return x + 1
+    fn = counting(slow)
+    cf = cache.CachedFunction(fn)
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(cf, 1) for _ in range(8)]
+        time.sleep(0.05)
+        gate.set()
+        assert [f.result() for f in futures] == [2] * 8
+    assert len(fn.calls) == 1
+
+
+def test_expired_entry_is_served_while_one_refresh_runs():
+    state = {"v": 1}
+    fn = counting(lambda: state["v"])
+    cf = cache.CachedFunction(fn, ttl=0.05)
+    assert cf() == 1
+    state["v"] = 2
+    time.sleep(0.06)
+    assert cf() == 1  # stale value, refresh in the background
+    assert wait_for(lambda: cf() == 2)
+    assert len(fn.calls) == 2
+
+
+def test_clear_is_lazy_and_never_serves_old_values():
+    state = {"v": 1}
+    fn = counting(lambda x: (x, state["v"]))
+    cf = cache.CachedFunction(fn)
+    for x in range(5):
+        cf(x)
+    state["v"] = 2
+    cf.clear()
+    assert len(fn.calls) == 5  # nothing refetched by clear() itself
+    assert cf(3) == (3, 2)
+    assert len(fn.calls) == 6  # only the key that was read again
+
+
+def test_values_are_copies():
+    cf = cache.CachedFunction(lambda: {"rows": [1]})
+    cf()["rows"].append(2)
+    assert cf() == {"rows": [1]}
+
+
+# --- Shared tier: replicas are CachedFunctions with the same name ---
+
+def test_replicas_share_one_fetch_and_one_invalidation(tier, monkeypatch):
+    monkeypatch.setattr(cache, "SHARED_VERSION_POLL", 0.0)
+    state = {"v": 1}
+    fn = counting(lambda: state["v"])
+    a, b = cache.CachedFunction(fn), cache.CachedFunction(fn)
+    assert a() == 1 and b() == 1
+    assert len(fn.calls) == 1  # b read a's value from the tier
+
+    state["v"] = 2
+    a.clear()  # bumps the shared version
+    assert a() == 2
+    assert wait_for(lambda: b() == 2)  # b's entry is outdated and refreshed
+    assert len(fn.calls) == 2
+
+
+# --- DeltaTable against the SQLite backend ---
+
+@pytest.fixture
+def repo():
+    return repository.Repository(repository.SQLiteBackend())
+
+
+def test_delta_sync_picks_up_inserts_updates_and_deletes(repo):
+    repo.clients.insert([{"name": f"c{i}"} for i in range(5)])
+    table = cache.DeltaTable(repo.clients)  # overlap re-reads writes stamped in the same millisecond
+    assert len(table.snapshot()) == 5
+
+    ids = sorted(table.rows)
+    repo.clients.update(ids[0], {"name": "renamed"})
+    repo.clients.delete(ids[1])
+    repo.clients.insert([{"name": "new"}])
+    table.invalidate()
+    rows = {r["id"]: r for r in table.snapshot()}
+    assert len(rows) == 5 and ids[1] not in rows
+    assert rows[ids[0]]["name"] == "renamed"
+    assert "new" in {r["name"] for r in rows.values()}
+    assert table.incremental
+
+
+def test_delta_sync_does_not_prune_rows_past_a_response_cap(repo, monkeypatch):
+    repo.clients.insert([{"name": f"c{i}"} for i in range(2500)])
+    select = repo.backend.select
+    monkeypatch.setattr(repo.backend, "select", lambda *a, limit=None, **k: select(*a, limit=min(limit or 1000, 1000), **k))
+    table = cache.DeltaTable(repo.clients)
+    assert len(table.snapshot()) == 2500
+    table.invalidate()
+    assert table.sync() and len(table.rows) == 2500
+
+
+def test_write_through_bumps_version_and_idle_sync_keeps_it(repo):
+    repo.clients.insert([{"name": "a"}])
+    table = cache.DeltaTable(repo.clients, overlap=0)
+    table.snapshot()
+    v = table.version
+    table.insert([{"name": "x"}])
+    assert table.version > v and len(table.rows) == 2
+    table.invalidate()
+    table.sync()
+    v = table.version
+    table.invalidate()
+    assert table.sync()
+    assert table.version == v  # nothing moved: derived data stays valid
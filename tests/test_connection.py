@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from utils.connection import ConnectionPool, PoolTimeout
+
+
+class Client:
+    count = 0
+
+    def __init__(self):
+        Client.count += 1
+        self.n = Client.count
+        self.healthy = True
+
+
+def check(client):
+    if not client.healthy:
+        raise ConnectionError("gone")
+
+
+def test_clients_are_reused_lifo():
+    pool = ConnectionPool(Client, size=2)
+    with pool.connection() as a:
+        with pool.connection() as b:
+            assert a is not b
+    with pool.connection() as c:
+        assert c is a  # last returned, first reused
+    m = pool.metrics()
+    assert m["created"] == 2 and m["open"] == 2 and m["idle"] == 2 and m["in_use"] == 0
+
+
+def test_connection_error_drops_the_client_but_query_errors_keep_it():
+    pool = ConnectionPool(Client, size=1)
+    with pytest.raises(ValueError):
+        with pool.connection() as a:
+            raise ValueError("bad query")
+    with pytest.raises(ConnectionError):
+        with pool.connection() as b:
+            assert b is a
+            raise ConnectionError("reset")
+    with pool.connection() as c:
+        assert c is not a
+    assert pool.metrics()["reconnects"] == 1
+
+
+def test_idle_client_failing_its_check_is_replaced():
+    pool = ConnectionPool(Client, size=1, check=check, check_after=0)
+    with pool.connection() as a:
+        a.healthy = False
+    with pool.connection() as b:
+        assert b is not a and b.healthy
+    assert pool.metrics()["failed_checks"] == 1
+
+
+def test_acquire_times_out_when_every_client_is_busy():
+    pool = ConnectionPool(Client, size=1, acquire_timeout=0.05)
+    held, done = threading.Event(), threading.Event()
+
+    def hold():
+        with pool.connection():
+            held.set()
+            done.wait(1)
+    t = threading.Thread(target=hold)
+    t.start()
+    held.wait(1)
+    try:
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+    finally:
+        done.set()
+        t.join()
+    assert pool.metrics()["timeouts"] == 1
+    with pool.connection():
+        pass  # the slot came back
+
+
+def test_failing_factory_does_not_leak_a_slot():
+    fail = [True]
+
+    def factory():
+        if fail[0]:
+            raise ConnectionError("refused")
+        return Client()
+    pool = ConnectionPool(factory, size=1, acquire_timeout=0.05, min_size=0)
+    with pytest.raises(ConnectionError):
+        with pool.connection():
+            pass
+    fail[0] = False
+    with pool.connection() as c:
+        assert isinstance(c, Client)
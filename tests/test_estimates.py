@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from benchmarks.synthetic import SETTINGS, estimate_case, make_estimate
+from utils import helpers
+
+FIELDS = ("total_material_base_cost", "labor_actual_cost", "total_project_cost", "total_profit",
+          "bill_amount", "advance_amount", "mat_sell", "disp_lt", "rounded_grand_total")
+
+
+def synthetic_estimates(n=2000):
+    """Mixed sizes, fractional quantities and both labor formats, items normalised like the Estimator saves them."""
+    rng = random.Random(7)
+    out = []
+    for i in range(n):
+        if i % 2:
+            est = make_estimate(rng, n_items=rng.randint(0, 40), legacy_labor=i % 4 == 1)
+        else:
+            est = estimate_case(rng.randint(1, 60), ("new", "legacy")[i % 4 == 0], seed=i)
+        est["items"] = helpers.create_item_dataframe(est["items"]).to_dict("records")
+        out.append(est)
+    return out
+
+
+def test_batch_matches_scalar_engine_exactly():
+    estimates = synthetic_estimates()
+    batch = helpers.calculate_estimates_batch(estimates, SETTINGS).to_dict("records")
+    assert len(batch) == len(estimates)
+    for i, (est, row) in enumerate(zip(estimates, batch)):
+        scalar = helpers.calculate_saved_estimate(est, SETTINGS)
+        assert row["valid"]
+        for field in FIELDS:
+            assert row[field] == scalar[field], (i, field, row[field], scalar[field])
+
+
+def test_batch_handles_empty_estimates():
+    batch = helpers.calculate_estimates_batch([None, {}, {"items": [], "days": 2}], SETTINGS)
+    assert batch["valid"].all()
+    assert (batch["total_material_base_cost"] == 0).all()
+
+
+def test_batch_marks_non_numeric_values_invalid():
+    good = {"items": [{"Item": "Pipe", "Qty": 2, "Base Rate": 100.0}], "days": 1, "profit_margin": 10}
+    bad = {"items": [{"Item": "Pipe", "Qty": "two", "Base Rate": 100.0}], "days": 1, "profit_margin": 10}
+    with pytest.raises(ValueError):
+        helpers.calculate_saved_estimate(bad, SETTINGS)
+
+    batch = helpers.calculate_estimates_batch([good, bad, good], SETTINGS)
+    assert batch["valid"].tolist() == [True, False, True]
+    assert batch.loc[1, ["bill_amount", "total_material_base_cost"]].isna().all()
+    assert batch.loc[0, "bill_amount"] == helpers.calculate_saved_estimate(good, SETTINGS)["bill_amount"]
@@ -0,0 +1,46 @@
+import pytest
+
+from benchmarks.synthetic import SETTINGS
+from utils import helpers, pnl
+
+ESTIMATE = {
+    "items": [
+        {"Item": "MS Pipe", "Qty": 40, "Base Rate": 2450.5, "Unit": "pcs"},
+        {"Item": "Sheet", "Qty": 12.5, "Base Rate": 7300.0, "Unit": "m"},
+        {"Item": "Bolts", "Qty": 300, "Base Rate": 12.4, "Unit": "pcs"},
+    ],
+    "days": 6,
+    "profit_margin": 20,
+    "labor_details": [{"role": "Welder", "count": 2, "rate": 500.0}],
+}
+
+
+def closed_row(**extra):
+    return {"status": "Closed", "internal_estimate": ESTIMATE, "final_settlement_amount": 250000.0,
+            "clients": {"name": "Acme"}, "created_at": "2024-05-10T10:00:00+05:30", **extra}
+
+
+def test_rows_without_est_columns_are_replayed():
+    scalar = helpers.calculate_saved_estimate(ESTIMATE, SETTINGS)
+    res = pnl.compute_pnl([closed_row()], SETTINGS)  # un-migrated database: no est_* keys at all
+    row = res["projects"].iloc[0]
+
+    assert row["Material Cost"] == pytest.approx(scalar["total_material_base_cost"])
+    assert row["Cost"] == pytest.approx(scalar["total_project_cost"])
+    assert row["Profit"] == pytest.approx(250000.0 - scalar["total_project_cost"])
+    assert res["total_quoted"] == pytest.approx(scalar["bill_amount"])
+
+
+def test_persisted_columns_match_replay():
+    persisted = closed_row(**helpers.estimate_summary_columns(helpers.calculate_saved_estimate(ESTIMATE, SETTINGS)))
+    a = pnl.compute_pnl([persisted], SETTINGS)["projects"]
+    b = pnl.compute_pnl([closed_row()], SETTINGS)["projects"]
+    assert a[["Revenue", "Cost", "Profit"]].equals(b[["Revenue", "Cost", "Profit"]])
+
+
+def test_month_uses_stored_offset():
+    rows = [closed_row(created_at="2024-04-01T02:00:00+05:30"), closed_row(created_at="2024-03-31T23:00:00+00:00"),
+            closed_row(created_at=None)]
+    res = pnl.compute_pnl(rows, SETTINGS)
+    assert res["projects"]["Month"].tolist()[:2] == ["2024-04", "2024-03"]
+    assert sorted(res["monthly"]["Month"]) == ["2024-03", "2024-04"]
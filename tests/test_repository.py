@@ -0,0 +1,56 @@
+import pytest
+
+from utils import repository
+
+
+@pytest.fixture
+def repo():
+    return repository.Repository(repository.SQLiteBackend())
+
+
+def page_all(table, page_size, filters=()):
+    rows, cursor = table.keyset(page_size, filters=filters)
+    pages = [rows]
+    while cursor is not None:
+        rows, cursor = table.keyset(page_size, cursor, filters=filters)
+        pages.append(rows)
+    return pages
+
+
+def test_keyset_pages_cover_every_row_once_in_table_order(repo):
+    # Inserted within the same second: created_at ties, so paging relies on the id tie-break
+    repo.clients.insert([{"name": f"c{i:03d}"} for i in range(53)])
+    pages = page_all(repo.clients, 10)
+    assert [len(p) for p in pages] == [10, 10, 10, 10, 10, 3]
+    ids = [r["id"] for p in pages for r in p]
+    expected = repo.clients.list(order=("created_at", "id")).data
+    assert ids == [r["id"] for r in expected]
+    assert len(set(ids)) == 53
+
+
+def test_keyset_exact_multiple_ends_without_an_empty_page(repo):
+    repo.clients.insert([{"name": f"c{i}"} for i in range(20)])
+    rows, cursor = repo.clients.keyset(10)
+    rows, cursor = repo.clients.keyset(10, cursor)
+    assert len(rows) == 10 and cursor is None
+
+
+def test_keyset_applies_filters(repo):
+    repo.clients.insert([{"name": f"{'a' if i % 2 else 'b'}{i}"} for i in range(30)])
+    pages = page_all(repo.clients, 4, filters=[("ilike", "name", "a%")])
+    names = [r["name"] for p in pages for r in p]
+    assert len(names) == 15 and all(n.startswith("a") for n in names)
+
+
+def test_rows_inserted_without_created_at_are_still_paged(repo):
+    repo.clients.insert([{"name": "x", "created_at": None}, {"name": "y"}])
+    pages = page_all(repo.clients, 1)
+    assert sorted(r["name"] for p in pages for r in p) == ["x", "y"]
+
+
+def test_list_all_reads_past_a_response_cap(repo, monkeypatch):
+    repo.clients.insert([{"name": f"c{i}"} for i in range(2500)])
+    select = repo.backend.select
+    monkeypatch.setattr(repo.backend, "select", lambda *a, limit=None, **k: select(*a, limit=min(limit or 1000, 1000), **k))
+    assert len(repo.clients.list().data) == 1000
+    assert len(repo.clients.list_all().data) == 2500
@@ -0,0 +1,54 @@
+from utils.search import EXACT, PREFIX, SUBSTRING, SearchCatalog, SearchIndex
+
+
+def make_index():
+    idx = SearchIndex((("name", 2), ("address", 1)))
+    idx.sync(1, lambda: {
+        1: ("Ravi Sharma", ("Ravi Sharma", "MG Road")),
+        2: ("Arman Rao", ("Arman Rao", "Ring Road")),
+        3: ("Sharmila", ("Sharmila", "Ravipur")),
+    })
+    return idx
+
+
+def test_exact_beats_prefix_beats_substring():
+    idx = make_index()
+    assert idx.search("sharma") == [(1, 2 * EXACT)]
+    assert idx.search("sharm") == [(3, 2 * PREFIX), (1, 2 * PREFIX)]  # tie: shorter primary text first
+    assert idx.search("arma") == [(2, 2 * PREFIX), (1, 2 * SUBSTRING)]
+
+
+def test_every_query_word_must_match_and_field_weights_add_up():
+    idx = make_index()
+    assert idx.search("ravi road") == [(1, 2 * EXACT + EXACT)]
+    assert idx.search("ravi nowhere") == []
+    assert [k for k, _ in idx.search("ravi")] == [1, 3]  # name outranks address
+
+
+def test_short_words_only_match_prefixes():
+    idx = make_index()
+    assert idx.search("ar") == [(2, 2 * PREFIX)]
+
+
+def test_sync_skips_build_for_same_token_and_diffs_changes():
+    idx = make_index()
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {1: ("Ravi Verma", ("Ravi Verma", "MG Road")), 3: ("Sharmila", ("Sharmila", "Ravipur"))}
+    assert not idx.sync(1, build) and not calls
+    assert idx.sync(2, build)
+    assert len(idx) == 2 and idx.label(2) is None
+    assert idx.search("sharma") == [] and idx.search("verma") == [(1, 2 * EXACT)]
+    assert idx.search("arman") == []  # removed words leave no postings behind
+    assert "arman" not in idx.vocab[0]
+
+
+def test_limit_and_catalog():
+    cat = SearchCatalog({"clients": (("name", 1),), "projects": (("title", 1),)})
+    cat.sync("clients", 1, lambda: {i: (f"Client {i}", (f"Client {i}",)) for i in range(50)})
+    cat.sync("projects", 1, lambda: {7: ("Kitchen", ("Kitchen",))})
+    assert len(cat["clients"].search("client", limit=5)) == 5
+    assert len(cat["clients"].search("client", limit=None)) == 50
+    assert cat.search("kitch") == {"projects": [(7, "Kitchen", PREFIX)]}
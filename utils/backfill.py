@@ -0,0 +1,70 @@
+"""
+Backfills the persisted estimate totals (est_* columns on projects) for rows
+saved before the Estimator started writing them.
+
+Usage:
+    python -m utils.backfill            # only rows with an estimate but no est_bill_amount
+    python -m utils.backfill --all      # recompute every row with an estimate
+    python -m utils.backfill --dry-run  # report what would change
+
+Credentials are read from .streamlit/secrets.toml (same keys as the app).
+"""
+import argparse
+import sys
+import tomllib
+
+from utils import helpers
+from utils.repository import create_repository
+
+SETTINGS_DEFAULTS = {'profit_margin': 15, 'advance_percentage': 10.0}
+
+
+def load_secrets(path=".streamlit/secrets.toml"):
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def backfill(repo, recompute_all=False, dry_run=False, log=print):
+    settings = repo.get_settings(SETTINGS_DEFAULTS)
+    rows = repo.projects.list(columns="id, internal_estimate, est_bill_amount", order="").data
+
+    todo = [r for r in rows if r.get('internal_estimate') and (recompute_all or r.get('est_bill_amount') is None)]
+    updated, skipped, failed = 0, len(rows) - len(todo), 0
+
+    try:
+        batch = helpers.calculate_estimates_batch([r['internal_estimate'] for r in todo], settings)
+        # Invalid rows (non-numeric values) are replayed below, which logs why they fail
+        summaries = [helpers.estimate_summary_columns(d) if d['valid'] else None for d in batch.to_dict('records')]
+    except Exception:
+        summaries = [None] * len(todo)  # a malformed estimate broke the batch -> replay row by row
+
+    for row, summary in zip(todo, summaries):
+        if summary is None:
+            try:
+                summary = helpers.estimate_summary_columns(helpers.calculate_saved_estimate(row['internal_estimate'], settings))
+            except Exception as e:
+                log(f"Project {row['id']}: could not replay estimate ({e})")
+                failed += 1
+                continue
+        if not dry_run:
+            repo.projects.update(row['id'], summary)
+        updated += 1
+
+    log(f"{'Would update' if dry_run else 'Updated'} {updated} project(s); skipped {skipped}; failed {failed}.")
+    return updated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill persisted estimate totals on projects.")
+    parser.add_argument("--all", action="store_true", help="recompute rows that already have totals")
+    parser.add_argument("--dry-run", action="store_true", help="report without writing")
+    parser.add_argument("--secrets", default=".streamlit/secrets.toml")
+    args = parser.parse_args(argv)
+
+    repo = create_repository(load_secrets(args.secrets))
+    backfill(repo, recompute_all=args.all, dry_run=args.dry_run)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,476 @@
+import pickle
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from utils import perf
+from utils.connection import is_connection_error
+
+# ---------------------------
+# INCREMENTAL TABLE CACHE
+# ---------------------------
+# st.cache_data re-downloads a whole table every time its TTL expires or a
+# write calls .clear(). DeltaTable keeps one in-memory copy per process and
+# only pulls rows whose `updated_at` moved past the last sync watermark.
+# Deleted rows are pruned with a cheap id-only query on each sync.
+#
+# Writes go through the same object (insert/update/delete) and are written
+# through: the rows the database returns are patched into the cached copy, so
+# a single status change never costs a table download.
+
+
+class DeltaTable:
+    def __init__(self, table, columns="*", min_interval=60, overlap=5, sort_key="created_at", desc=True):
+        """
+        table: repository Table (must expose an `updated_at` column for incremental sync)
+        columns: select list; keep it free of embeds so a joined row never goes stale
+        min_interval: seconds between syncs unless invalidated
+        overlap: seconds re-read before the watermark to cover late-committing writes
+        """
+        self.table = table
+        self.columns = columns
+        self.min_interval = min_interval
+        self.overlap = overlap
+        self.sort_key = sort_key
+        self.desc = desc
+
+        self.rows = {}
+        self.version = 0  # bumped whenever rows change; a cheap token for derived data (search index)
+        self.watermark = None
+        self.synced_at = 0.0
+        self.stale = True
+        self.incremental = True
+        self.lock = threading.Lock()
+        self._ordered = None
+
+    def invalidate(self):
+        """Forces a delta sync on the next read (cheap: only changed rows are fetched)."""
+        self.stale = True
+
+    def needs_sync(self):
+        return self.stale or (time.time() - self.synced_at) >= self.min_interval
+
+    def sync(self, force=False):
+        if not force and not self.needs_sync():
+            return False
+        # Stale-while-revalidate: once loaded, readers that find another session
+        # mid-sync keep serving the current rows instead of queueing behind it
+        if not self.lock.acquire(blocking=force or self.watermark is None):
+            return False
+        try:
+            if not force and not self.needs_sync():
+                return False  # another session synced while we waited
+            if self.watermark is None or not self.incremental:
+                self._full_load()
+            else:
+                try:
+                    self._delta_load()
+                except Exception as e:
+                    if not self._schema_error(e):
+                        return False  # transient (network, timeout): keep serving, retry the delta next read
+                    # updated_at column missing -> degrade to full reloads
+                    self.incremental = False
+                    self._full_load()
+            self.synced_at = time.time()
+            self.stale = False
+            return True
+        finally:
+            self.lock.release()
+
+    def _full_load(self):
+        data = self.table.list_all(columns=self.columns).data
+        self.rows = {r["id"]: r for r in data}
+        self.version += 1
+        self.watermark = self._max_stamp(data)
+        self._ordered = None
+
+    def _delta_load(self):
+        since = self._shift(self.watermark, -self.overlap)
+        # Paged: a response capped at max-rows would prune every row past the cap as deleted
+        changed = self.table.list_all(columns=self.columns, filters=[("gt", "updated_at", since)]).data
+        live_ids = {r["id"] for r in self.table.list_all(columns="id").data}
+
+        newest = self._max_stamp(changed)
+        if newest and newest > self.watermark:
+            self.watermark = newest
+        if not changed and len(live_ids) == len(self.rows) and live_ids.issuperset(self.rows):
+            return  # nothing moved: keep the rows (and their version)
+
+        # Build a new dict and swap it in so readers never see a half-merged table
+        rows = {rid: r for rid, r in self.rows.items() if rid in live_ids}
+        for row in changed:
+            rows[row["id"]] = row
+        self.rows = rows
+        self.version += 1
+        self._ordered = None
+
+    def snapshot(self):
+        """Rows in display order. Each row is a shallow copy so callers may annotate it freely."""
+        self.sync()
+        ordered = self._ordered
+        if ordered is None:
+            ordered = sorted(self.rows.values(), key=lambda r: r.get(self.sort_key) or "", reverse=self.desc)
+            self._ordered = ordered
+        return [dict(r) for r in ordered]
+
+    def get(self, key_value):
+        """One row (copy) by id, or None."""
+        self.sync()
+        row = self.rows.get(key_value)
+        return dict(row) if row else None
+
+    # --- write-through ---
+    def apply(self, rows):
+        """Patches returned rows into the cache. The watermark is left alone so other writers are still picked up."""
+        if not rows:
+            return
+        with self.lock:
+            merged = dict(self.rows)
+            for row in rows:
+                merged[row["id"]] = {**merged.get(row["id"], {}), **row}
+            self.rows = merged
+            self.version += 1
+            self._ordered = None
+
+    def discard(self, ids):
+        ids = set(ids)
+        if not ids:
+            return
+        with self.lock:
+            self.rows = {rid: r for rid, r in self.rows.items() if rid not in ids}
+            self.version += 1
+            self._ordered = None
+
+    def _patch(self, res, deleted=False):
+        # No representation returned (e.g. row-level security hides it) -> fall back to a delta sync
+        if not res.data:
+            self.invalidate()
+        elif deleted:
+            self.discard([r["id"] for r in res.data])
+        else:
+            self.apply(res.data)
+        return res
+
+    def insert(self, rows):
+        return self._patch(self.table.insert(rows))
+
+    def update(self, key_value, values):
+        return self._patch(self.table.update(key_value, values))
+
+    def update_where(self, values, filters):
+        return self._patch(self.table.update_where(values, filters))
+
+    def delete(self, key_value):
+        return self._patch(self.table.delete(key_value), deleted=True)
+
+    def delete_where(self, filters):
+        return self._patch(self.table.delete_where(filters), deleted=True)
+
+    def column_map(self, field):
+        """{id: row[field]} without copying whole rows."""
+        self.sync()
+        return {rid: r.get(field) for rid, r in self.rows.items()}
+
+    @staticmethod
+    def _schema_error(exc):
+        """The table has no usable updated_at (PostgREST 42703 / SQLite "no such column"), as opposed to a failed request."""
+        return not is_connection_error(exc) and "updated_at" in str(exc)
+
+    @staticmethod
+    def _max_stamp(rows):
+        stamps = [r.get("updated_at") for r in rows if r.get("updated_at")]
+        return max(stamps) if stamps else None
+
+    @staticmethod
+    def _shift(stamp, seconds):
+        try:
+            return (datetime.fromisoformat(str(stamp).replace("Z", "+00:00")) + timedelta(seconds=seconds)).isoformat()
+        except ValueError:
+            return stamp
+
+
+# ---------------------------
+# PROCESS-WIDE FUNCTION CACHE
+# ---------------------------
+# Stand-in for st.cache_data that plain threads can use too (the concurrent
+# loader below runs getters off the script thread). Entries live in a registry
+# keyed by the function's qualified name, so they survive Streamlit re-executing
+# app.py. Values are stored pickled and each caller gets its own copy, like
+# st.cache_data.
+#
+# Stampede protection:
+# - single-flight: one fetch per key at a time; concurrent callers join it.
+# - stale-while-revalidate: an expired entry is still served while exactly one
+#   background refresh replaces it, so a TTL expiry never stalls every session.
+# - clear() only bumps a generation and drops the entries, so a write costs one
+#   write. Each key is refetched lazily by its next reader (single-flight), and
+#   nobody joins a fetch, or is served a value, from before the write.
+#
+# With a shared tier configured (utils.shared_cache, SHARED_CACHE_URL) misses read
+# through it first: replicas share one fetch per key (lease) and one invalidation
+# (version bump), and a local entry whose shared version is outdated counts as expired.
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+_shared_tier = None
+SHARED_VERSION_POLL = 1.0  # seconds a function's shared version is trusted before re-reading it
+SHARED_WAIT = 10.0         # max seconds to wait on another replica's fetch before doing our own
+
+
+def set_shared_tier(tier):
+    global _shared_tier
+    _shared_tier = tier
+
+
+class CachedFunction:
+    def __init__(self, fn, ttl=None):
+        self.fn = fn
+        self.ttl = ttl
+        self.name = f"{fn.__module__}.{fn.__qualname__}"
+        self.entries = {}   # key -> (stored_at, payload, generation, shared_version)
+        self.inflight = {}  # key -> (generation, Future(payload))
+        self.generation = 0
+        self.version = 0  # bumped whenever an entry is stored or cleared (see DeltaTable.version)
+        self.lock = threading.Lock()
+        self._shared_seen = (0.0, 0)  # (checked_at, shared version)
+
+    @staticmethod
+    def _key(args, kwargs):
+        return pickle.dumps((args, sorted(kwargs.items())))
+
+    def _fresh(self, entry):
+        return (entry is not None and entry[2] == self.generation
+                and (self.ttl is None or time.time() - entry[0] < self.ttl)
+                and entry[3] == self._shared_version())
+
+    def _shared_version(self):
+        if _shared_tier is None:
+            return 0
+        checked_at, version = self._shared_seen
+        if time.time() - checked_at >= SHARED_VERSION_POLL:
+            try:
+                version = _shared_tier.version(self.name)
+            except Exception:
+                pass  # tier unreachable: keep the last known version
+            self._shared_seen = (time.time(), version)
+        return version
+
+    def _load(self, key, args, kwargs):
+        """
+        Returns (payload, stored_at, shared_version), reading through the shared tier when there is one.
+        Only tier errors fall back to a plain local fetch; an error from the function itself propagates.
+        """
+        tier = _shared_tier
+        if tier is None:
+            return pickle.dumps(self.fn(*args, **kwargs)), time.time(), 0
+        try:
+            version, hit, leased = self._lease(tier, key)
+        except Exception:
+            # tier unavailable: fetch locally
+            return pickle.dumps(self.fn(*args, **kwargs)), time.time(), self._shared_version()
+        if hit:
+            return hit[2], hit[1], version  # another replica already fetched it
+        try:
+            payload = pickle.dumps(self.fn(*args, **kwargs))
+            try:
+                tier.put(self.name, key, version, payload)
+            except Exception:
+                pass  # not shared this time; the local entry still serves
+            return payload, time.time(), version
+        finally:
+            if leased:
+                try:
+                    tier.release_lease(self.name, key)
+                except Exception:
+                    pass  # expires after LEASE_SECONDS
+
+    def _lease(self, tier, key):
+        """(version, hit, leased): a usable shared entry, or the fetch lease (False after SHARED_WAIT: fetch anyway)."""
+        version = tier.version(self.name)
+        deadline = time.time() + SHARED_WAIT
+        while True:
+            hit = tier.get(self.name, key)
+            if hit and hit[0] == version and (self.ttl is None or time.time() - hit[1] < self.ttl):
+                return version, hit, False
+            if tier.acquire_lease(self.name, key):
+                return version, None, True
+            if time.time() > deadline:
+                return version, None, False
+            time.sleep(0.1)
+
+    def is_fresh(self, *args, **kwargs):
+        return self._fresh(self.entries.get(self._key(args, kwargs)))
+
+    def __call__(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        key = self._key(args, kwargs)
+        entry = self.entries.get(key)
+        if entry is not None and entry[2] != self.generation:
+            entry = None  # fetched before a clear(): never served, this reader refetches
+        if entry is not None:
+            op = "hit"
+            if not self._fresh(entry):
+                op = "stale"
+                self._refresh_async(key, args, kwargs)
+            payload = entry[1]
+        else:
+            op, payload = "miss", self._fetch(key, args, kwargs)
+        value = pickle.loads(payload)
+        perf.record("cache", self.name, (time.perf_counter() - t0) * 1000,
+                    nbytes=len(payload), op=op, hit=op != "miss")
+        return value
+
+    def _fetch(self, key, args, kwargs):
+        """Single-flight fetch for the current generation; returns the payload."""
+        with self.lock:
+            gen = self.generation
+            flight = self.inflight.get(key)
+            owner = flight is None or flight[0] != gen
+            if owner:
+                flight = self.inflight[key] = (gen, Future())
+        if not owner:
+            return flight[1].result()
+
+        future = flight[1]
+        try:
+            payload, stored_at, shared_version = self._load(key, args, kwargs)
+            with self.lock:
+                current = self.entries.get(key)
+                if current is None or current[2] <= gen:  # never overwrite a newer generation
+                    self.entries[key] = (stored_at, payload, gen, shared_version)
+                    self.version += 1
+            future.set_result(payload)
+            return payload
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                if self.inflight.get(key) is flight:
+                    del self.inflight[key]
+
+    def _refresh_async(self, key, args, kwargs):
+        flight = self.inflight.get(key)
+        if flight is not None and flight[0] == self.generation:
+            return  # a refresh is already running
+        _loader_pool.submit(self._refresh_quietly, key, args, kwargs)
+
+    def _refresh_quietly(self, key, args, kwargs):
+        try:
+            self._fetch(key, args, kwargs)
+        except Exception:
+            pass  # keep serving the stale value; the next expired read tries again
+
+    def clear(self):
+        """Invalidates every cached key; each is refetched by its next reader, so unread variants cost nothing."""
+        if _shared_tier is not None:
+            try:
+                self._shared_seen = (time.time(), _shared_tier.bump(self.name))  # invalidates every replica
+            except Exception:
+                pass
+        with self.lock:
+            self.generation += 1
+            self.version += 1
+            self.entries = {}
+
+
+def cached(ttl=None):
+    """
+    @cached(ttl=300) -> process-wide cache with .clear() and .is_fresh(*args).
+    Re-decorating on the next script run keeps the entries and swaps in the new function body.
+    """
+    def decorator(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+        with _registry_lock:
+            cf = _registry.get(name)
+            if cf is None:
+                cf = _registry[name] = CachedFunction(fn, ttl)
+            else:
+                cf.fn, cf.ttl = fn, ttl
+        return cf
+    return decorator
+
+
+_shared = {}
+
+
+def shared(name, factory):
+    """Process-wide singleton (st.cache_resource without a script-thread requirement)."""
+    obj = _shared.get(name)
+    if obj is None:
+        with _registry_lock:
+            obj = _shared.get(name)
+            if obj is None:
+                obj = _shared[name] = factory()
+    return obj
+
+
+# ---------------------------
+# CONCURRENT LOADER
+# ---------------------------
+_loader_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="loader")
+
+
+def load_all(calls):
+    """
+    Runs independent reads concurrently and joins them.
+
+    calls: {name: fn} or {name: (fn, arg, ...)}. Calls whose cache entry is
+    fresh are answered inline (no thread hop); the rest fan out to the pool.
+    Each call is timed into utils.perf. Returns {name: result}; the first
+    exception raised by any call is re-raised after all of them finish.
+    """
+    stats = perf.current()
+    results, errors, futures = {}, [], {}
+
+    def run(name, fn, args, hit):
+        with perf.bind(stats):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                perf.record_load(name, (time.perf_counter() - t0) * 1000, hit)
+
+    for name, call in calls.items():
+        fn, *args = call if isinstance(call, tuple) else (call,)
+        if getattr(fn, "is_fresh", None) and fn.is_fresh(*args):
+            try: results[name] = run(name, fn, args, True)
+            except Exception as e: errors.append(e)
+        else:
+            futures[name] = _loader_pool.submit(run, name, fn, args, False)
+
+    for name, fut in futures.items():
+        try: results[name] = fut.result()
+        except Exception as e: errors.append(e)
+    if errors:
+        raise errors[0]
+    return results
+
+
+def prefetch(calls):
+    """
+    Fire-and-forget warm-up: starts every call that is not already fresh on the
+    loader pool and returns {name: Future}. Foreground callers that arrive while
+    a fetch is running join it (single-flight) instead of starting their own.
+    """
+    stats = perf.current()
+    futures = {}
+    for name, call in calls.items():
+        fn, *args = call if isinstance(call, tuple) else (call,)
+        if getattr(fn, "is_fresh", None) and fn.is_fresh(*args):
+            continue
+        futures[name] = _loader_pool.submit(_warm, stats, name, fn, args)
+    return futures
+
+
+def _warm(stats, name, fn, args):
+    # Report into the run that started the warm-up (pool threads have their own throwaway counters)
+    with perf.bind(stats):
+        t0 = time.perf_counter()
+        try:
+            fn(*args)
+        except Exception:
+            pass  # callers joined to this fetch see the error; later reads retry
+        perf.record_load(f"warm:{name}", (time.perf_counter() - t0) * 1000, False)
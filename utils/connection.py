@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# ---------------------------
+# DATABASE CLIENT POOL
+# ---------------------------
+# Long-lived, bounded set of database clients shared by every session of the
+# process. Clients are reused LIFO (the warmest connection first); one that sat
+# idle longer than `check_after` is health-checked before it is handed out, and
+# one that failed a check or raised a connection error is dropped and replaced
+# on the next acquire. Nothing is torn down just because a new visitor arrived.
+
+DEFAULT_POOL_SIZE = 8  # matches utils.cache's loader threads
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+def is_connection_error(exc):
+    """Transport-level failures (the client is broken), as opposed to query errors."""
+    if isinstance(exc, (ConnectionError, TimeoutError, OSError)):
+        return True
+    return type(exc).__module__.split(".")[0] in ("httpx", "httpcore", "h2")
+
+
+class ConnectionPool:
+    def __init__(self, factory, size=DEFAULT_POOL_SIZE, check=None, check_after=30.0,
+                 acquire_timeout=10.0, min_size=1):
+        self.factory = factory
+        self.size = size
+        self.check = check
+        self.check_after = check_after
+        self.acquire_timeout = acquire_timeout
+        self.idle = []  # stack of (client, last_used)
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.created = 0
+        self.reconnects = 0
+        self.failed_checks = 0
+        self.acquires = 0
+        self.timeouts = 0
+        self.acquire_ms = deque(maxlen=1000)  # recent acquire latencies
+        # Open eagerly so bad credentials fail at start-up, not on the first query
+        for _ in range(min(min_size, size)):
+            self.idle.append((self._open(), time.monotonic()))
+
+    def _open(self):
+        client = self.factory()
+        with self.lock:
+            self.open += 1
+            self.created += 1
+        return client
+
+    def _drop(self, reason):
+        with self.lock:
+            self.open -= 1
+            self.reconnects += 1  # the replacement is opened by the next acquire
+            if reason == "check":
+                self.failed_checks += 1
+
+    def _checkout(self):
+        while True:
+            with self.lock:
+                item = self.idle.pop() if self.idle else None
+            if item is None:
+                return self._open()
+            client, last_used = item
+            if self.check is None or time.monotonic() - last_used < self.check_after:
+                return client
+            try:
+                self.check(client)
+                return client
+            except Exception:
+                self._drop("check")
+
+    @contextmanager
+    def connection(self):
+        """Borrows a client; a connection error raised inside the block drops it."""
+        t0 = time.perf_counter()
+        if not self.slots.acquire(timeout=self.acquire_timeout):
+            with self.lock:
+                self.timeouts += 1
+            raise PoolTimeout(f"no database connection free after {self.acquire_timeout}s")
+        try:
+            client = self._checkout()
+        except Exception:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.in_use += 1
+            self.acquires += 1
+            self.acquire_ms.append((time.perf_counter() - t0) * 1000)
+
+        healthy = True
+        try:
+            yield client
+        except Exception as exc:
+            healthy = not is_connection_error(exc)
+            raise
+        finally:
+            with self.lock:
+                self.in_use -= 1
+                if healthy:
+                    self.idle.append((client, time.monotonic()))
+            if not healthy:
+                self._drop("error")
+            self.slots.release()
+
+    def metrics(self):
+        with self.lock:
+            lat = sorted(self.acquire_ms)
+            return {
+                "size": self.size,
+                "open": self.open,
+                "idle": len(self.idle),
+                "in_use": self.in_use,
+                "created": self.created,
+                "reconnects": self.reconnects,
+                "failed_checks": self.failed_checks,
+                "acquires": self.acquires,
+                "timeouts": self.timeouts,
+                "acquire_ms_avg": sum(lat) / len(lat) if lat else 0.0,
+                "acquire_ms_p95": lat[int(len(lat) * 0.95)] if lat else 0.0,
+                "acquire_ms_max": lat[-1] if lat else 0.0,
+            }
@@ -0,0 +1,119 @@
+import multiprocessing
+import pickle
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from utils import helpers
+
+# ---------------------------
+# BULK PDF EXPORT
+# ---------------------------
+# Month-end paperwork: client invoices / estimates, internal profit reports and
+# order lists for many projects, rendered in worker processes and written into
+# one ZIP as each document finishes. Jobs are plain tuples so they pickle cheaply:
+#     (filename, kind, args, kwargs)   kind is a key of helpers.PDF_METHODS
+
+EXPORT_KINDS = {"estimate": "Client Invoice / Estimate", "internal": "Internal Profit Report", "order": "Order List"}
+POOL_THRESHOLD = 8  # below this, process start-up costs more than it saves
+
+
+def _safe_name(name):
+    return re.sub(r'[^\w\s-]', '', str(name)).strip().replace(' ', '_') or "project"
+
+
+def project_jobs(project, global_settings, kinds=tuple(EXPORT_KINDS)):
+    """Render jobs for one project row (`clients` embedded as {'name': ..}). Empty if it has no estimate."""
+    est = project.get('internal_estimate')
+    if not isinstance(est, dict) or not est.get('items'):
+        return []
+
+    client = (project.get('clients') or {}).get('name') or "Unknown"
+    details = helpers.calculate_saved_estimate(est, global_settings)
+    items = [helpers.derive_item_fields(i) for i in est['items']]
+    days = est.get('days', 1.0)
+    labor_cost = details['labor_actual_cost']
+    is_final = project.get('status') in helpers.INACTIVE_STATUSES
+    base = f"{_safe_name(client)}_{project['id']}"
+
+    jobs = []
+    if "estimate" in kinds:
+        prefix = "Invoice" if is_final else "Est"
+        jobs.append((f"{prefix}_{base}.pdf", "estimate",
+                     (client, items, days, labor_cost, details['bill_amount'], details['advance_amount']),
+                     {"is_final": is_final}))
+    if "internal" in kinds:
+        # Sold-at values spread the margin evenly over materials and labor
+        mm = 1 + helpers.normalize_margins(est.get('profit_margin', est.get('margins')), global_settings) / 100.0
+        sold = [{**i, 'Total Price': i['Total Price'] * mm} for i in items]
+        jobs.append((f"Internal_{base}.pdf", "internal",
+                     (client, sold, days, labor_cost, labor_cost * mm, details['bill_amount'], details['total_profit']), {}))
+    if "order" in kinds:
+        jobs.append((f"Order_{base}.pdf", "order", (client, items), {}))
+    return jobs
+
+
+_worker_generator = None
+
+
+def _init_worker():
+    # One generator per worker process, reused for every document it renders
+    global _worker_generator
+    _worker_generator = helpers.PDFGenerator()
+
+
+def render_job(job, generator=None):
+    """Worker entry point (top-level so it pickles): returns (filename, pdf bytes)."""
+    filename, kind, args, kwargs = job
+    gen = generator or _worker_generator or helpers.PDFGenerator()
+    return filename, getattr(gen, helpers.PDF_METHODS[kind])(*args, **kwargs)
+
+
+def export_zip(jobs, workers=None, progress=None):
+    """
+    Renders every job and returns the ZIP bytes.
+    progress(done, total) is called as each document lands in the archive.
+    """
+    buf = BytesIO()
+    total = len(jobs)
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for done, (filename, data) in enumerate(_render_all(jobs, workers), 1):
+            zf.writestr(filename, data)
+            if progress:
+                progress(done, total)
+    return buf.getvalue()
+
+
+def _render_all(jobs, workers):
+    if len(jobs) < POOL_THRESHOLD:
+        yield from _render_local(jobs)
+        return
+    # spawn: never fork a process that is running server threads
+    try:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker)
+    except (OSError, NotImplementedError):
+        yield from _render_local(jobs)
+        return
+    # Workers that die on start-up or jobs that do not pickle only show up at submit / result():
+    # render whatever has not been yielded yet in this process instead
+    yielded = set()
+    with pool:
+        try:
+            futures = {pool.submit(render_job, job): i for i, job in enumerate(jobs)}
+            for fut in as_completed(futures):
+                result = fut.result()
+                yielded.add(futures[fut])
+                yield result
+            return
+        except (BrokenProcessPool, pickle.PicklingError, OSError):
+            pool.shutdown(wait=False, cancel_futures=True)
+    yield from _render_local([job for i, job in enumerate(jobs) if i not in yielded])
+
+
+def _render_local(jobs):
+    gen = helpers.PDFGenerator()
+    for job in jobs:
+        yield render_job(job, gen)
@@ -1,8 +1,15 @@
 import pandas as pd
+import numpy as np
 import math
+import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from fpdf import FPDF
 from datetime import datetime
-from io import BytesIO
+
+from utils import perf
 
 # ---------------------------
 # GLOBAL CONSTANTS
@@ -15,10 +22,38 @@ INACTIVE_STATUSES = ["Work Done", "Closed"]
 
 # --- PROFESSIONAL PDF GENERATOR ---
 class PDFGenerator:
+    """
+    One generator can render many documents (e.g. a bulk export batch): each
+    generate_* call starts a fresh FPDF, while the header text and table
+    layouts below are computed once and reused.
+    """
+    # Table layouts: (width, heading, align)
+    INVOICE_COLUMNS = ((100, "Description", 'L'), (15, "Qty", 'C'), (15, "Unit", 'C'), (60, "Amount (INR)", 'R'))
+    INTERNAL_COLUMNS = ((70, "Item Description", 'L'), (15, "Qty", 'C'), (35, "Base Rate", 'R'), (35, "Sold At", 'R'), (35, "Profit", 'R'))
+    ORDER_COLUMNS = ((15, "Sr No", 'C'), (95, "Item Description", 'L'), (40, "Qty (pcs)", 'C'), (40, "Qty (feet)", 'C'))
+
     def __init__(self):
         self.pdf = FPDF()
+        self.date_line = f"Date: {datetime.now().strftime('%d-%b-%Y')}"
+        self._used = False
+
+    def _new_document(self):
+        if self._used:
+            self.pdf = FPDF()
+        self._used = True
+
+    def _table_header(self, columns, height):
+        last = len(columns) - 1
+        for i, (w, heading, align) in enumerate(columns):
+            self.pdf.cell(w, height, heading, 1, 1 if i == last else 0, align, 1)
+
+    def _output(self):
+        # Final bytes in one step: PyFPDF returns a latin-1 str, fpdf2 a bytearray
+        out = self.pdf.output(dest='S')
+        return out.encode('latin-1') if isinstance(out, str) else bytes(out)
 
     def _add_header(self, title):
+        self._new_document()
         self.pdf.add_page()
         self.pdf.set_font("Arial", 'B', 20)
         self.pdf.cell(0, 10, "Galaxy Fabrication Experts", ln=True, align='L')
@@ -28,7 +63,7 @@ class PDFGenerator:
         self.pdf.set_font("Arial", 'B', 12)
         self.pdf.cell(0, 8, title, ln=True)
         self.pdf.set_font("Arial", '', 10)
-        self.pdf.cell(0, 8, f"Date: {datetime.now().strftime('%d-%b-%Y')}", ln=True)
+        self.pdf.cell(0, 8, self.date_line, ln=True)
         self.pdf.ln(5)
 
     def generate_client_invoice(self, client_name, items, labor_days, labor_total, grand_total, advance_amount, is_final=False):
@@ -37,10 +72,7 @@ class PDFGenerator:
         
         self.pdf.set_fill_color(240, 240, 240)
         self.pdf.set_font("Arial", 'B', 10)
-        self.pdf.cell(100, 10, "Description", 1, 0, 'L', 1)
-        self.pdf.cell(15, 10, "Qty", 1, 0, 'C', 1)
-        self.pdf.cell(15, 10, "Unit", 1, 0, 'C', 1)
-        self.pdf.cell(60, 10, "Amount (INR)", 1, 1, 'R', 1)
+        self._table_header(self.INVOICE_COLUMNS, 10)
         
         self.pdf.set_font("Arial", '', 10)
         for item in items:
@@ -72,21 +104,14 @@ class PDFGenerator:
             self.pdf.set_text_color(100, 100, 100)
             self.pdf.multi_cell(0, 5, "NOTE: This is an estimate only. Final rates may vary based on actual site conditions and market fluctuations. Valid for 7 days.")
         
-        pdf_output = BytesIO()
-        pdf_string = self.pdf.output(dest='S')
-        pdf_output.write(pdf_string.encode('latin-1'))
-        return pdf_output.getvalue()
+        return self._output()
 
     def generate_internal_report(self, client_name, items, labor_days, labor_cost, labor_charged, grand_total, total_profit):
         self._add_header(f"INTERNAL PROFIT REPORT (CONFIDENTIAL) - {client_name}")
         
         self.pdf.set_fill_color(220, 220, 220)
         self.pdf.set_font("Arial", 'B', 9)
-        self.pdf.cell(70, 8, "Item Description", 1, 0, 'L', 1)
-        self.pdf.cell(15, 8, "Qty", 1, 0, 'C', 1)
-        self.pdf.cell(35, 8, "Base Rate", 1, 0, 'R', 1)
-        self.pdf.cell(35, 8, "Sold At", 1, 0, 'R', 1)
-        self.pdf.cell(35, 8, "Profit", 1, 1, 'R', 1)
+        self._table_header(self.INTERNAL_COLUMNS, 8)
 
         self.pdf.set_font("Arial", '', 9)
         for item in items:
@@ -116,10 +141,7 @@ class PDFGenerator:
         self.pdf.cell(120, 10, "NET PROFIT:", 1, 0, 'R')
         self.pdf.set_text_color(0, 150, 0); self.pdf.cell(70, 10, f"Rs. {total_profit:,.2f}", 1, 1, 'R')
 
-        pdf_output = BytesIO()
-        pdf_string = self.pdf.output(dest='S')
-        pdf_output.write(pdf_string.encode('latin-1'))
-        return pdf_output.getvalue()
+        return self._output()
 
     def generate_order_list(self, client_name, items):
         self._add_header(f"ORDER LIST - {client_name}")
@@ -127,11 +149,7 @@ class PDFGenerator:
         self.pdf.set_fill_color(230, 230, 250) # Light lavender
         self.pdf.set_font("Arial", 'B', 10)
         
-        # Columns: Sr No (15), Item (95), Qty pcs (40), Qty ft (40)
-        self.pdf.cell(15, 10, "Sr No", 1, 0, 'C', 1)
-        self.pdf.cell(95, 10, "Item Description", 1, 0, 'L', 1)
-        self.pdf.cell(40, 10, "Qty (pcs)", 1, 0, 'C', 1)
-        self.pdf.cell(40, 10, "Qty (feet)", 1, 1, 'C', 1)
+        self._table_header(self.ORDER_COLUMNS, 10)
         
         self.pdf.set_font("Arial", '', 10)
         for idx, item in enumerate(items, 1):
@@ -149,10 +167,7 @@ class PDFGenerator:
             self.pdf.cell(40, 8, pcs_str, 1, 0, 'C')
             self.pdf.cell(40, 8, ft_str, 1, 1, 'C')
             
-        pdf_output = BytesIO()
-        pdf_string = self.pdf.output(dest='S')
-        pdf_output.write(pdf_string.encode('latin-1'))
-        return pdf_output.getvalue()
+        return self._output()
 
 def create_pdf(*args, **kwargs):
     pdf_gen = PDFGenerator()
@@ -166,6 +181,59 @@ def create_order_pdf(*args, **kwargs):
     pdf_gen = PDFGenerator()
     return pdf_gen.generate_order_list(*args, **kwargs)
 
+PDF_METHODS = {"estimate": "generate_client_invoice", "internal": "generate_internal_report", "order": "generate_order_list"}
+
+def render_pdfs(jobs, generator=None):
+    """Renders (kind, args, kwargs) jobs with one shared generator; yields bytes in order."""
+    gen = generator or PDFGenerator()
+    for kind, args, kwargs in jobs:
+        yield getattr(gen, PDF_METHODS[kind])(*args, **kwargs)
+
+# --- RENDERED PDF CACHE ---
+# PDFs are built on demand and kept by a hash of their inputs (LRU), so an
+# unchanged estimate costs nothing per rerun and repeat downloads are instant.
+PDF_RENDERERS = {"estimate": create_pdf, "internal": create_internal_pdf, "order": create_order_pdf}
+PDF_CACHE_SIZE = 64
+
+_pdf_cache = OrderedDict()
+_pdf_cache_lock = threading.Lock()
+
+
+def pdf_cache_key(kind, *args, **kwargs):
+    # The header carries today's date, so it is part of the content
+    payload = [kind, datetime.now().strftime('%d-%b-%Y'), args, kwargs]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def peek_pdf(kind, *args, **kwargs):
+    """Cached bytes for these inputs, or None (never renders)."""
+    key = pdf_cache_key(kind, *args, **kwargs)
+    with _pdf_cache_lock:
+        data = _pdf_cache.get(key)
+        if data is not None:
+            _pdf_cache.move_to_end(key)
+        return data
+
+
+def cached_pdf(kind, *args, **kwargs):
+    """Renders (or reuses) the `kind` PDF for these inputs and returns its bytes."""
+    t0 = time.perf_counter()
+    key = pdf_cache_key(kind, *args, **kwargs)
+    with _pdf_cache_lock:
+        if key in _pdf_cache:
+            _pdf_cache.move_to_end(key)
+            data = _pdf_cache[key]
+            perf.record("pdf", kind, (time.perf_counter() - t0) * 1000, nbytes=len(data), op="hit", hit=True)
+            return data
+    data = PDF_RENDERERS[kind](*args, **kwargs)
+    perf.record("pdf", kind, (time.perf_counter() - t0) * 1000, nbytes=len(data), op="render", hit=False)
+    with _pdf_cache_lock:
+        _pdf_cache[key] = data
+        _pdf_cache.move_to_end(key)
+        while len(_pdf_cache) > PDF_CACHE_SIZE:
+            _pdf_cache.popitem(last=False)
+    return data
+
 
 def normalize_margins(margins_data, global_settings):
     """
@@ -303,6 +371,140 @@ def calculate_estimate_details(edf_items_list, days, margins, global_settings, w
         "edf_details_df": edf_details_df
     }
 
+# Persisted on the projects table next to internal_estimate so reporting can
+# read plain numbers instead of replaying the engine.
+ESTIMATE_SUMMARY_COLUMNS = {
+    "est_material_cost": "total_material_base_cost",
+    "est_labor_cost": "labor_actual_cost",
+    "est_bill_amount": "bill_amount",
+    "est_advance_amount": "advance_amount",
+    "est_profit": "total_profit",
+}
+
+
+def estimate_summary_columns(details):
+    """Maps a calculate_estimate_details() result onto the est_* project columns."""
+    return {col: float(details[key]) for col, key in ESTIMATE_SUMMARY_COLUMNS.items()}
+
+
+def calculate_saved_estimate(est, global_settings):
+    """Replays the engine for a saved internal_estimate with the same inputs the Estimator used."""
+    margin = normalize_margins(est.get('profit_margin', est.get('margins')), global_settings)
+    return calculate_estimate_details(
+        est.get('items', []), est.get('days', 1.0), margin, global_settings,
+        welders=est.get('welders', 0), helpers=est.get('helpers', 0),
+        labor_details=est.get('labor_details')
+    )
+
+
+def calculate_estimates_batch(estimates, global_settings):
+    """
+    Vectorized calculate_saved_estimate() for many saved estimates at once.
+
+    Items of every estimate are flattened into one columnar table and the
+    per-estimate totals are computed with NumPy reductions. Results match the
+    scalar engine exactly: material is summed per estimate with the same NumPy
+    reduction pandas' Series.sum() uses (a different summation order can move
+    a total across a .5 rounding boundary), and bill / advance use the same
+    round-half-even integer rounding (Python round() / np.rint).
+
+    Missing Qty / Base Rate values are skipped, as in the scalar sum. An
+    estimate with a value that is present but not numeric, where
+    calculate_saved_estimate() would raise, gets valid=False and NaN totals.
+
+    Args:
+        estimates (list): saved internal_estimate dicts (None / {} allowed -> all zeros).
+        global_settings (dict): Global settings.
+
+    Returns:
+        pd.DataFrame: one row per estimate, in input order, with the numeric keys of
+        calculate_estimate_details(): total_material_base_cost, labor_actual_cost,
+        total_project_cost, total_profit, bill_amount, advance_amount, mat_sell,
+        disp_lt, rounded_grand_total (no edf_details_df), plus `valid`.
+    """
+    n = len(estimates)
+    welder_rate = float(global_settings.get('welder_daily_rate', 500.0))
+    helper_rate = float(global_settings.get('helper_daily_rate', 300.0))
+    adv_margin_pct = float(global_settings.get('advance_percentage', 20.0))
+
+    # --- Flatten (the only per-item Python work: pulling values out of JSON) ---
+    item_counts = np.zeros(n, dtype=np.int64)
+    qtys, bases = [], []
+    days = np.empty(n, dtype=float)
+    margins = np.empty(n, dtype=float)
+    lab_idx, lab_cnt, lab_rate = [], [], []
+    legacy = np.zeros((n, 2), dtype=float)  # welders, helpers
+
+    for i, est in enumerate(estimates):
+        est = est or {}
+        items = est.get('items') or []
+        item_counts[i] = len(items)
+        qtys.extend(it.get('Qty') for it in items)
+        bases.extend(it.get('Base Rate') for it in items)
+        days[i] = float(est.get('days', 1.0))
+        margins[i] = normalize_margins(est.get('profit_margin', est.get('margins')), global_settings)
+        labor_details = est.get('labor_details')
+        if labor_details:
+            for l in labor_details:
+                lab_idx.append(i)
+                lab_cnt.append(float(l.get('count', 0)))
+                lab_rate.append(float(l.get('rate', 0)))
+        else:
+            legacy[i, 0] = float(est.get('welders', 0))
+            legacy[i, 1] = float(est.get('helpers', 0))
+
+    # --- Material: Qty * Base Rate, summed per estimate over contiguous slices ---
+    qty_raw, base_raw = pd.Series(qtys, dtype=object), pd.Series(bases, dtype=object)
+    qty = pd.to_numeric(qty_raw, errors='coerce').to_numpy(dtype=float)
+    base = pd.to_numeric(base_raw, errors='coerce').to_numpy(dtype=float)
+    # Present but unparseable (float() raises in the scalar engine), as opposed to missing
+    bad_item = ((np.isnan(qty) & qty_raw.notna().to_numpy())
+                | (np.isnan(base) & base_raw.notna().to_numpy()))
+    line_cost = np.nan_to_num(base * qty, nan=0.0)  # Series.sum() skips NaN
+
+    # np.add.reduceat sums sequentially; Series.sum() is ndarray.sum() (pairwise),
+    # so each slice is summed the same way to get bit-identical totals
+    ends = np.cumsum(item_counts)
+    starts = ends - item_counts
+    material = np.array([line_cost[s:e].sum() if e > s else 0.0 for s, e in zip(starts, ends)], dtype=float)
+    valid = np.ones(n, dtype=bool)
+    if bad_item.any():
+        owner = np.repeat(np.arange(n), item_counts)
+        valid[owner[bad_item]] = False
+
+    # --- Labor: dynamic roles accumulate in order (like the scalar loop); legacy welders/helpers otherwise ---
+    lab_idx = np.asarray(lab_idx, dtype=np.int64)
+    lab_cost = np.asarray(lab_cnt, dtype=float) * np.asarray(lab_rate, dtype=float) * days[lab_idx]
+    labor = np.bincount(lab_idx, weights=lab_cost, minlength=n).astype(float)
+    is_legacy = np.ones(n, dtype=bool)
+    is_legacy[lab_idx] = False
+    labor[is_legacy] = (legacy[is_legacy, 0] * welder_rate * days[is_legacy]
+                        + legacy[is_legacy, 1] * helper_rate * days[is_legacy])
+
+    # --- Totals (same operation order as calculate_estimate_details) ---
+    total_cost = material + labor
+    profit_amount = total_cost * (margins / 100.0)
+    bill = np.rint(total_cost + profit_amount)
+    advance = np.rint(bill * (adv_margin_pct / 100.0))
+
+    out = pd.DataFrame({
+        "total_material_base_cost": material,
+        "labor_actual_cost": labor,
+        "total_project_cost": total_cost,
+        "total_profit": bill - total_cost,
+        "bill_amount": bill.astype(np.int64),
+        "advance_amount": advance.astype(np.int64),
+        "mat_sell": material,
+        "disp_lt": labor,
+        "rounded_grand_total": bill.astype(np.int64),
+    })
+    if not valid.all():
+        out = out.astype(float)
+        out.loc[~valid] = np.nan
+    out["valid"] = valid
+    return out
+
+
 def calculate_profit_row(row):
     """Calculates the profit for a single row in an estimate."""
     qty = float(row.get('Qty', 0))
@@ -349,3 +551,66 @@ def create_item_dataframe(items):
     column_order = ['Qty', 'Item', 'Unit', 'Base Rate', 'Unit Price', 'Total Price']
     df = df.reindex(columns=column_order, fill_value="")
     return df
+
+
+def _to_float(v):
+    try:
+        f = float(v)
+        return 0.0 if math.isnan(f) else f
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def derive_item_fields(item):
+    """
+    Returns a normalized copy of an estimate item with its derived columns
+    (Total Price, Unit Price, Qty (pcs)) computed from Qty / Base Rate / Unit.
+    """
+    ni = dict(item)
+    if 'base_rate' in ni and 'Base Rate' not in ni: ni['Base Rate'] = ni.pop('base_rate')
+    if 'unit' in ni and 'Unit' not in ni: ni['Unit'] = ni.pop('unit')
+    if 'item' in ni and 'Item' not in ni: ni['Item'] = ni.pop('item')
+
+    qty = _to_float(ni.get('Qty'))
+    base = _to_float(ni.get('Base Rate'))
+    ni['Item'] = ni.get('Item') or ""
+    ni['Unit'] = ni.get('Unit') or "pcs"
+    ni['Qty'] = qty
+    ni['Base Rate'] = base
+    ni['Total Price'] = base * qty
+    ni['Unit Price'] = base
+    ni['Qty (pcs)'] = qty / 20.0 if ni['Unit'] == 'ft' else qty
+    return ni
+
+
+def apply_editor_changes(rows, changes, base_rates=None):
+    """
+    Folds a st.data_editor change set into the source rows and returns the new list.
+
+    Args:
+        rows (list): Source item dicts the editor was rendered from (positional indices).
+        changes (dict): {"edited_rows": {i: {col: val}}, "added_rows": [..], "deleted_rows": [i, ..]}
+        base_rates (dict): {item_name: base_rate} to fill Base Rate on added/renamed rows.
+
+    Only edited and added rows are re-derived; untouched rows are reused as-is.
+    """
+    base_rates = base_rates or {}
+
+    def restore_base_rate(row):
+        if not _to_float(row.get('Base Rate')) and row.get('Item') in base_rates:
+            row['Base Rate'] = base_rates[row['Item']]
+        return derive_item_fields(row)
+
+    out = list(rows)
+    for i, edits in (changes.get("edited_rows") or {}).items():
+        i = int(i)
+        if 0 <= i < len(out):
+            out[i] = restore_base_rate({**out[i], **edits})
+
+    deleted = {int(i) for i in (changes.get("deleted_rows") or [])}
+    if deleted:
+        out = [r for i, r in enumerate(out) if i not in deleted]
+
+    for added in changes.get("added_rows") or []:
+        out.append(restore_base_rate({k: v for k, v in added.items() if v is not None}))
+    return out
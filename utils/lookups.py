@@ -0,0 +1,137 @@
+from functools import cached_property
+
+# ---------------------------
+# PER-RERUN LOOKUP REGISTRY
+# ---------------------------
+# Reference tables (project types, staff, roles, suppliers, inventory) are
+# needed as id -> name / name -> row maps all over the app. Lookups builds
+# each map lazily, at most once per script run, and every tab shares it.
+# Create a fresh instance at the top of each run so edits show up after st.rerun().
+
+
+class Lookups:
+    def __init__(self, project_types=None, staff=None, staff_roles=None, suppliers=None, inventory=None):
+        """Each argument is a zero-arg loader returning a response with `.data` (e.g. the cached get_* functions)."""
+        self._loaders = {
+            "project_types": project_types, "staff": staff, "staff_roles": staff_roles,
+            "suppliers": suppliers, "inventory": inventory,
+        }
+
+    def _rows(self, name):
+        loader = self._loaders.get(name)
+        if loader is None:
+            return []
+        try:
+            res = loader()
+            return res.data if res and res.data else []
+        except Exception:
+            return []
+
+    # --- Project Types ---
+    @cached_property
+    def project_types(self):
+        return self._rows("project_types")
+
+    @cached_property
+    def project_type_names(self):
+        """{id: type_name}"""
+        return {p['id']: p['type_name'] for p in self.project_types}
+
+    @cached_property
+    def project_type_ids(self):
+        """{type_name: id}"""
+        return {p['type_name']: p['id'] for p in self.project_types}
+
+    # --- Staff & Roles ---
+    @cached_property
+    def staff(self):
+        return self._rows("staff")
+
+    @cached_property
+    def staff_names(self):
+        """{id: name}"""
+        return {s['id']: s['name'] for s in self.staff}
+
+    @cached_property
+    def staff_by_id(self):
+        return {s['id']: s for s in self.staff}
+
+    @cached_property
+    def staff_roles(self):
+        return self._rows("staff_roles")
+
+    @cached_property
+    def role_names(self):
+        return [r['role_name'] for r in self.staff_roles]
+
+    # --- Suppliers ---
+    @cached_property
+    def suppliers(self):
+        return self._rows("suppliers")
+
+    @cached_property
+    def supplier_names(self):
+        """{id: name}"""
+        return {s['id']: s['name'] for s in self.suppliers}
+
+    @cached_property
+    def supplier_ids(self):
+        """{name: id}"""
+        return {s['name']: s['id'] for s in self.suppliers}
+
+    # --- Inventory ---
+    @cached_property
+    def inventory(self):
+        return self._rows("inventory")
+
+    @cached_property
+    def inventory_by_name(self):
+        return {i['item_name']: i for i in self.inventory}
+
+    @cached_property
+    def inventory_by_id(self):
+        return {i['id']: i for i in self.inventory}
+
+
+# ---------------------------
+# INVENTORY INDEX
+# ---------------------------
+# The Estimator's item picker, base-rate restoration and hardware/raw split all
+# look items up by type/dimension or by name. InventoryIndex builds those maps
+# once per inventory version (cache it next to get_inventory and clear both together).
+
+
+class InventoryIndex:
+    def __init__(self, rows):
+        self.by_name = {}  # item_name -> row
+        self.tree = {}     # item_type -> {dimension -> row}, in inventory order
+        for r in rows or []:
+            self.by_name.setdefault(r.get('item_name'), r)
+            itype, dim = r.get('item_type'), r.get('dimension')
+            if itype is not None and dim is not None:
+                self.tree.setdefault(itype, {}).setdefault(dim, r)
+        self.types = sorted(self.tree)
+        self.has_types = bool(rows) and 'item_type' in rows[0] and 'dimension' in rows[0]
+
+    def __len__(self):
+        return len(self.by_name)
+
+    def dimensions(self, item_type):
+        return list(self.tree.get(item_type, {}))
+
+    def item(self, item_type, dimension):
+        return self.tree.get(item_type, {}).get(dimension)
+
+    @cached_property
+    def base_rates(self):
+        """{item_name: base_rate}"""
+        return {n: r.get('base_rate', 0) for n, r in self.by_name.items()}
+
+    @cached_property
+    def item_types(self):
+        """{item_name: item_type}"""
+        return {n: r.get('item_type') for n, r in self.by_name.items()}
+
+    def types_of(self, names, default='Raw Material'):
+        """Vectorized item_type lookup for a Series of item names."""
+        return names.map(self.item_types).fillna(default)
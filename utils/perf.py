@@ -0,0 +1,235 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# ---------------------------
+# PER-RUN PERFORMANCE COUNTERS
+# ---------------------------
+# Streamlit executes each session's script run on its own thread, so the
+# counters are thread-local: one session's queries never land in another's.
+# The repository backends call record_query(); section() measures a block.
+#
+# Every measured call is also kept as an event for the performance HUD:
+#     {"kind", "name", "op", "ms", "rows", "bytes", "hit", "section", "at_ms"}
+# kind is "query" (backend round trip), "cache" (cached getter; op hit / stale / miss),
+# "load" (load_all branch), "pdf" or "chart". finish_run() folds a run into one
+# summary record; to_jsonl() exports summaries for offline analysis.
+
+MAX_EVENTS = 2000  # per run; past this only the totals keep counting
+SLOWEST = 10       # events kept in a run summary
+
+
+class RunStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_ms = 0.0
+        self.rows = 0
+        self.loads = []  # (name, ms, cache_hit) from cache.load_all
+        self.events = []
+        self.kinds = {}  # kind -> {"count", "ms", "rows", "bytes", "hits"}
+        self.dropped = 0
+        self.section = None
+        self.begun = False     # set by begin_run()
+        self.finished = None   # event count when finish_run() summarised it
+        self.lock = threading.Lock()  # loader threads report into the same run
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+_local = threading.local()
+
+
+def current():
+    stats = getattr(_local, "stats", None)
+    if stats is None:
+        stats = _local.stats = RunStats()
+    return stats
+
+
+def begin_run():
+    """
+    Resets this thread's counters; call once at the top of each script run.
+    Events recorded since the last run finished (widget callbacks run before
+    the script body) are carried into the new run.
+    """
+    prev = getattr(_local, "stats", None)
+    stats = _local.stats = RunStats()
+    stats.begun = True
+    if prev is not None:
+        if not prev.begun:
+            carried = prev.events
+        elif prev.finished is not None:
+            carried = prev.events[prev.finished:]
+        else:
+            carried = []
+        for ev in carried:
+            _add(stats, dict(ev, section=None))
+    return stats
+
+
+@contextmanager
+def bind(stats):
+    """Makes a helper thread report into `stats` (the calling script run's counters)."""
+    prev = getattr(_local, "stats", None)
+    _local.stats = stats
+    try:
+        yield stats
+    finally:
+        _local.stats = prev
+
+
+def payload_bytes(data, sample=20):
+    """Approximate JSON size of a result; serialises at most `sample` rows and extrapolates."""
+    try:
+        if isinstance(data, list):
+            if not data:
+                return 0
+            head = data[:sample]
+            return int(len(json.dumps(head, default=str)) * len(data) / len(head))
+        return len(json.dumps(data, default=str)) if data is not None else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def _add(stats, ev):
+    with stats.lock:
+        agg = stats.kinds.setdefault(ev["kind"], {"count": 0, "ms": 0.0, "rows": 0, "bytes": 0, "hits": 0})
+        agg["count"] += 1
+        agg["ms"] += ev["ms"]
+        agg["rows"] += ev["rows"]
+        agg["bytes"] += ev["bytes"]
+        agg["hits"] += bool(ev["hit"])
+        if ev["kind"] == "query":
+            stats.queries += 1
+            stats.query_ms += ev["ms"]
+            stats.rows += ev["rows"]
+        if len(stats.events) < MAX_EVENTS:
+            stats.events.append(ev)
+        else:
+            stats.dropped += 1
+
+
+def record(kind, name, ms, rows=0, nbytes=0, op=None, hit=None):
+    stats = current()
+    _add(stats, {"kind": kind, "name": name, "op": op, "ms": ms, "rows": rows, "bytes": nbytes,
+                 "hit": hit, "section": stats.section, "at_ms": stats.elapsed_ms() - ms})
+
+
+def record_query(table, op, ms, rows=0, nbytes=0):
+    record("query", table, ms, rows, nbytes, op=op)
+
+
+def record_load(name, ms, cache_hit):
+    stats = current()
+    with stats.lock:
+        stats.loads.append((name, ms, cache_hit))
+    record("load", name, ms, hit=cache_hit)
+
+
+@contextmanager
+def measure(kind, name, op=None):
+    """
+    Times the block as one event. The yielded dict may be filled with
+    "rows" / "bytes" / "hit" before the block ends.
+    """
+    info = {"rows": 0, "bytes": 0, "hit": None}
+    t0 = time.perf_counter()
+    try:
+        yield info
+    finally:
+        record(kind, name, (time.perf_counter() - t0) * 1000, info["rows"], info["bytes"], op=op, hit=info["hit"])
+
+
+@contextmanager
+def section(name, costs):
+    """
+    Measures the wrapped block and stores {"ms", "queries"} in costs[name].
+    Also recorded when the block ends in st.rerun()/st.stop().
+    """
+    stats = current()
+    q0, t0 = stats.queries, time.perf_counter()
+    prev, stats.section = stats.section, name
+    try:
+        yield
+    finally:
+        stats.section = prev
+        costs[name] = {"ms": (time.perf_counter() - t0) * 1000, "queries": stats.queries - q0}
+
+
+def savings(costs, rendered):
+    """
+    What skipping every other section saved this run, using each one's last
+    measured cost. Returns (ms, queries, unmeasured_section_count).
+    """
+    ms, queries, unknown = 0.0, 0, 0
+    for name, cost in costs.items():
+        if name == rendered:
+            continue
+        if cost is None:
+            unknown += 1
+        else:
+            ms += cost["ms"]
+            queries += cost["queries"]
+    return ms, queries, unknown
+
+
+# --- HUD / export ---
+def finish_run(section, **fields):
+    """Summary record of this thread's run (one JSON line); later events go to the next run."""
+    stats = current()
+    with stats.lock:
+        events = list(stats.events)
+        stats.finished = len(stats.events)
+        kinds = {k: dict(v) for k, v in stats.kinds.items()}
+    return {
+        "ts": datetime.now().isoformat(timespec="seconds"),
+        "section": section,
+        "ms": round(stats.elapsed_ms(), 1),
+        "queries": stats.queries,
+        "query_ms": round(stats.query_ms, 1),
+        "rows": stats.rows,
+        "bytes": kinds.get("query", {}).get("bytes", 0),  # database payload
+        "kinds": kinds,
+        "slowest": sorted(events, key=lambda e: -e["ms"])[:SLOWEST],
+        "dropped": stats.dropped,
+        **fields,
+    }
+
+
+def tab_summary(runs):
+    """Per-section aggregates of run summaries: runs, avg / p95 / max ms, avg queries and payload KB."""
+    by_section = {}
+    for r in runs:
+        by_section.setdefault(r["section"], []).append(r)
+    out = []
+    for name, rs in by_section.items():
+        ms = sorted(r["ms"] for r in rs)
+        out.append({
+            "section": name,
+            "runs": len(rs),
+            "avg_ms": sum(ms) / len(ms),
+            "p95_ms": ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+            "max_ms": ms[-1],
+            "avg_queries": sum(r["queries"] for r in rs) / len(rs),
+            "avg_kb": sum(r["bytes"] for r in rs) / len(rs) / 1024,
+        })
+    return sorted(out, key=lambda r: -r["avg_ms"])
+
+
+def to_jsonl(records):
+    return "".join(json.dumps(r, default=str) + "\n" for r in records)
+
+
+_sink_lock = threading.Lock()
+
+
+def append_jsonl(path, record):
+    """Appends one summary to a JSON-lines file (production log shared by every session)."""
+    line = json.dumps(record, default=str) + "\n"
+    with _sink_lock:
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write(line)
@@ -0,0 +1,124 @@
+import pandas as pd
+
+from utils import helpers
+
+# ---------------------------
+# P&L ENGINE
+# ---------------------------
+# Builds every number the P&L tab shows from flat columns in one pass:
+# cash-flow metrics, the per-project profitability table and monthly rollups.
+# Estimate totals come from the persisted est_* columns; rows saved before
+# those existed are replayed together through calculate_estimates_batch().
+
+CLOSED_STATUSES = ("Work Done", "Closed")
+EST_COLUMNS = list(helpers.ESTIMATE_SUMMARY_COLUMNS)
+
+
+def _num(df, col, missing=0.0):
+    if col not in df.columns:
+        return pd.Series(missing, index=df.index, dtype=float)
+    return pd.to_numeric(df[col], errors='coerce')
+
+
+def _month(created):
+    """YYYY-MM of each timestamp in the offset it was stored with (converting to UTC would move IST midnights back a day)."""
+    text = created.map(lambda v: None if v is None or v is pd.NaT else str(v))
+    ok = text.str.match(r"\d{4}-\d{2}-").fillna(False).astype(bool)
+    return text.str.slice(0, 7).where(ok)
+
+
+def _estimate_days(est):
+    try:
+        return float(est.get('days', 0.0)) if est else 0.0
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
+
+
+def estimate_frame(df, global_settings):
+    """
+    est_* columns for every row of `df` (NaN where the row has no estimate),
+    plus `has_estimate`. Persisted values win; the rest are batch-replayed.
+    """
+    # A database without the est_* columns yet (not migrated) replays every row
+    out = pd.DataFrame({col: _num(df, col, missing=float('nan')) for col in EST_COLUMNS}, index=df.index)
+    ests = df['internal_estimate'] if 'internal_estimate' in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+    replay = out['est_bill_amount'].isna() & ests.map(lambda e: isinstance(e, dict) and bool(e))
+    if replay.any():
+        batch = helpers.calculate_estimates_batch(ests[replay].tolist(), global_settings)
+        for col, key in helpers.ESTIMATE_SUMMARY_COLUMNS.items():
+            out.loc[replay, col] = batch[key].to_numpy(dtype=float)
+
+    out['has_estimate'] = out['est_bill_amount'].notna()
+    out[EST_COLUMNS] = out[EST_COLUMNS].fillna(0.0)
+    return out
+
+
+def compute_pnl(projects, global_settings, material_spend=0.0):
+    """
+    Args:
+        projects (list | DataFrame): project rows (get_projects() shape, `clients` embedded as {'name': ..}).
+        global_settings (dict): settings (daily_labor_cost, margins, ...).
+        material_spend (float): logged supplier spend (get_spend_summary()['total_spend']).
+
+    Returns:
+        dict: cash-flow metrics plus `projects` (per-project table) and `monthly` DataFrames.
+    """
+    df = projects if isinstance(projects, pd.DataFrame) else pd.DataFrame(projects)
+    if df.empty:
+        df = pd.DataFrame(columns=['status', 'final_settlement_amount', 'created_at'])
+
+    collected = _num(df, 'final_settlement_amount').fillna(0.0)
+    closed = df['status'].isin(CLOSED_STATUSES) if 'status' in df.columns else pd.Series(False, index=df.index)
+    cdf = df[closed]
+    est = estimate_frame(cdf, global_settings)
+    has_est = est['has_estimate']
+
+    # --- Cash flow ---
+    total_collected = float(collected.sum())
+    total_quoted = float(est.loc[has_est, 'est_bill_amount'].sum())
+    daily_labor_cost = float(global_settings.get('daily_labor_cost', 1000.0))
+    days = cdf['internal_estimate'].map(_estimate_days) if 'internal_estimate' in cdf.columns else pd.Series(0.0, index=cdf.index)
+    total_labor_expense = float((days * daily_labor_cost).sum())
+    total_material_expense = float(material_spend or 0.0)
+    total_expenses = total_material_expense + total_labor_expense
+    cash_profit = total_collected - total_expenses
+
+    # --- Per-project profitability ---
+    revenue = collected[closed]
+    revenue = revenue.where(~((revenue == 0) & has_est), est['est_bill_amount'])
+    mat_cost = est['est_material_cost'].where(has_est, 0.0)
+    labor_cost = est['est_labor_cost'].where(has_est, 0.0)
+    cost = mat_cost + labor_cost
+    profit = (revenue - cost).where(has_est, 0.0)
+
+    clients = cdf['clients'] if 'clients' in cdf.columns else pd.Series(None, index=cdf.index, dtype=object)
+    created = cdf['created_at'] if 'created_at' in cdf.columns else pd.Series(None, index=cdf.index, dtype=object)
+    table = pd.DataFrame({
+        "Client": clients.map(lambda c: c.get('name', 'Unknown') if isinstance(c, dict) else "Unknown"),
+        "Revenue": revenue,
+        "Cost": cost,
+        "Profit": profit,
+        "Material Cost": mat_cost,
+        "Labor Cost": labor_cost,
+        "created_at": created,
+    }).reset_index(drop=True)
+    table['Month'] = _month(table['created_at'])
+
+    monthly = table.groupby('Month')[['Revenue', 'Cost', 'Profit']].sum().reset_index()
+
+    return {
+        "total_collected": total_collected,
+        "total_quoted": total_quoted,
+        "total_material_expense": total_material_expense,
+        "total_labor_expense": total_labor_expense,
+        "total_expenses": total_expenses,
+        "cash_profit": cash_profit,
+        "margin_pct": (cash_profit / total_collected * 100) if total_collected > 0 else 0,
+        "discount_loss": total_quoted - total_collected,
+        "projects_completed": int(closed.sum()),
+        "total_est_cost": float(cost.sum()),
+        "total_est_profit": float(profit.sum()),
+        "projects": table,
+        "monthly": monthly,
+    }
@@ -0,0 +1,660 @@
+import functools
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from utils import perf
+from utils.connection import ConnectionPool, DEFAULT_POOL_SIZE, is_connection_error
+
+# ---------------------------
+# DATA ACCESS LAYER
+# ---------------------------
+# Every table the app touches goes through a Repository. The repository talks
+# to a backend that speaks a tiny query vocabulary (select / insert / update /
+# upsert / delete + filter tuples), so the same app code runs against Supabase
+# in production and against an in-process SQLite database for offline
+# benchmarks, load tests and read replicas.
+#
+# Filters are plain tuples: (op, column, value) where op is one of
+# "eq", "neq", "gt", "gte", "lt", "lte", "in", "not_in", "ilike".
+# Columns on an embedded table use dot notation, e.g. ("ilike", "clients.name", "%jo%").
+# Keyset pagination compares column tuples: ("before" | "after", ("created_at", "id"), (ts, 42))
+# keeps rows whose (created_at, id) sorts before / after the cursor. `order` may be a tuple of columns.
+
+TABLES = [
+    "clients", "projects", "project_types", "inventory", "suppliers",
+    "supplier_purchases", "staff", "staff_roles", "settings", "users",
+]
+
+PRIMARY_KEYS = {"staff_roles": "role_name", "users": "username"}
+
+# Columns stored as JSON text in SQLite (JSONB / arrays in Postgres)
+JSON_COLUMNS = {
+    "clients": {"internal_estimate", "client_estimate", "assigned_staff", "image_urls", "projects"},
+    "projects": {"internal_estimate", "assigned_staff", "site_photos"},
+}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    phone TEXT,
+    address TEXT,
+    status TEXT DEFAULT 'Active',
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    start_date TEXT,
+    internal_estimate TEXT,
+    client_estimate TEXT,
+    final_settlement_amount REAL,
+    next_action_date TEXT,
+    assigned_staff TEXT DEFAULT '[]',
+    measurements TEXT,
+    image_urls TEXT DEFAULT '[]',
+    projects TEXT DEFAULT '[]',
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE TABLE IF NOT EXISTS project_types (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type_name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_id INTEGER REFERENCES clients(id),
+    project_type_id INTEGER REFERENCES project_types(id),
+    status TEXT DEFAULT 'Draft',
+    measurements TEXT,
+    visit_date TEXT,
+    site_photos TEXT DEFAULT '[]',
+    internal_estimate TEXT,
+    est_material_cost REAL,
+    est_labor_cost REAL,
+    est_bill_amount REAL,
+    est_advance_amount REAL,
+    est_profit REAL,
+    assigned_staff TEXT DEFAULT '[]',
+    final_settlement_amount REAL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+CREATE TABLE IF NOT EXISTS inventory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_name TEXT NOT NULL,
+    base_rate REAL NOT NULL,
+    unit TEXT DEFAULT 'pcs',
+    item_type TEXT,
+    dimension TEXT
+);
+CREATE TABLE IF NOT EXISTS suppliers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    contact_person TEXT,
+    phone TEXT,
+    gstin TEXT
+);
+CREATE TABLE IF NOT EXISTS supplier_purchases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    supplier_id INTEGER REFERENCES suppliers(id),
+    item_name TEXT,
+    quantity REAL,
+    cost REAL,
+    purchase_date TEXT,
+    notes TEXT
+);
+CREATE TABLE IF NOT EXISTS staff (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    role TEXT NOT NULL,
+    phone TEXT,
+    salary REAL DEFAULT 0,
+    joined_date TEXT DEFAULT CURRENT_DATE,
+    status TEXT DEFAULT 'Available',
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS staff_roles (
+    role_name TEXT PRIMARY KEY,
+    default_salary REAL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS settings (
+    id INTEGER PRIMARY KEY,
+    daily_labor_cost REAL,
+    advance_percentage REAL DEFAULT 10.0,
+    profit_margin INTEGER DEFAULT 15
+);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    recovery_key TEXT NOT NULL DEFAULT ''
+);
+-- Delta sync: bump updated_at on every write (mirrors the Postgres trigger in schema.sql)
+CREATE TRIGGER IF NOT EXISTS clients_touch AFTER UPDATE ON clients
+    WHEN NEW.updated_at IS OLD.updated_at
+    BEGIN UPDATE clients SET updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE id = NEW.id; END;
+CREATE TRIGGER IF NOT EXISTS projects_touch AFTER UPDATE ON projects
+    WHEN NEW.updated_at IS OLD.updated_at
+    BEGIN UPDATE projects SET updated_at = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE id = NEW.id; END;
+CREATE INDEX IF NOT EXISTS clients_updated_at_idx ON clients(updated_at);
+CREATE INDEX IF NOT EXISTS projects_updated_at_idx ON projects(updated_at);
+-- Keyset pagination on (created_at, id). A NULL created_at would fall outside every page.
+-- SQLite cannot add NOT NULL to an existing column, so the column stays nullable in every
+-- database file: the UPDATEs backfill old rows (no-ops once done) and the triggers fill an
+-- explicit NULL on insert
+CREATE INDEX IF NOT EXISTS clients_created_id_idx ON clients(created_at, id);
+CREATE INDEX IF NOT EXISTS projects_created_id_idx ON projects(created_at, id);
+UPDATE clients SET created_at = COALESCE(strftime('%Y-%m-%d %H:%M:%S', updated_at), CURRENT_TIMESTAMP) WHERE created_at IS NULL;
+UPDATE projects SET created_at = COALESCE(strftime('%Y-%m-%d %H:%M:%S', updated_at), CURRENT_TIMESTAMP) WHERE created_at IS NULL;
+CREATE TRIGGER IF NOT EXISTS clients_created_at AFTER INSERT ON clients
+    WHEN NEW.created_at IS NULL
+    BEGIN UPDATE clients SET created_at = CURRENT_TIMESTAMP WHERE id = NEW.id; END;
+CREATE TRIGGER IF NOT EXISTS projects_created_at AFTER INSERT ON projects
+    WHEN NEW.created_at IS NULL
+    BEGIN UPDATE projects SET created_at = CURRENT_TIMESTAMP WHERE id = NEW.id; END;
+"""
+
+
+LIST_PAGE_SIZE = 1000  # Supabase's default PostgREST max-rows
+
+
+class Result:
+    """Same shape as the Supabase APIResponse the app already consumes (.data / .count)."""
+
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+    def __repr__(self):
+        return f"Result(rows={len(self.data)}, count={self.count})"
+
+
+def _order_columns(order):
+    if not order:
+        return ()
+    return (order,) if isinstance(order, str) else tuple(order)
+
+
+def _timed(fn):
+    """Reports every backend round trip (table/rpc name, op, ms, rows, payload bytes) to utils.perf."""
+    @functools.wraps(fn)
+    def wrapper(self, name, *args, **kwargs):
+        t0 = time.perf_counter()
+        res = fn(self, name, *args, **kwargs)
+        rows = len(res.data) if isinstance(res.data, list) else 1
+        perf.record_query(name, fn.__name__, (time.perf_counter() - t0) * 1000, rows, perf.payload_bytes(res.data))
+        return res
+    return wrapper
+
+
+# --- SUPABASE BACKEND ---
+def _ping(client):
+    client.table("settings").select("id").limit(1).execute()
+
+
+def _quote(value):
+    # PostgREST logic-tree values: double-quoted so ':' ',' '.' in timestamps are literal
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _keyset_or(op, cols, vals):
+    """or_() argument for a lexicographic (cols) < / > (vals) comparison."""
+    cmp = "lt" if op == "before" else "gt"
+    terms = []
+    for i, (col, val) in enumerate(zip(cols, vals)):
+        conds = [f"{c}.eq.{_quote(v)}" for c, v in zip(cols[:i], vals[:i])] + [f"{col}.{cmp}.{_quote(val)}"]
+        terms.append(conds[0] if len(conds) == 1 else f"and({','.join(conds)})")
+    return ",".join(terms)
+
+
+class SupabaseBackend:
+    """Borrows a client from a ConnectionPool per call; reads retry once on a dropped connection."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @classmethod
+    def from_credentials(cls, url, key, pool_size=DEFAULT_POOL_SIZE):
+        from supabase import create_client
+        return cls(ConnectionPool(lambda: create_client(url, key), size=pool_size, check=_ping))
+
+    def _run(self, fn, retry=False):
+        try:
+            with self.pool.connection() as client:
+                return fn(client)
+        except Exception as exc:
+            if not (retry and is_connection_error(exc)):
+                raise
+        with self.pool.connection() as client:  # fresh client; the broken one was dropped
+            return fn(client)
+
+    def connection_metrics(self):
+        return self.pool.metrics()
+
+    def _apply_filters(self, query, filters):
+        for op, col, val in filters:
+            if op == "in":
+                query = query.in_(col, list(val))
+            elif op == "not_in":
+                query = query.not_.in_(col, list(val))
+            elif op in ("eq", "neq", "gt", "gte", "lt", "lte", "ilike"):
+                query = getattr(query, op)(col, val)
+            elif op in ("before", "after"):
+                query = query.or_(_keyset_or(op, col, val))
+            else:
+                raise ValueError(f"Unsupported filter op: {op}")
+        return query
+
+    @_timed
+    def select(self, table, columns="*", filters=(), order=None, desc=False, limit=None, offset=0, count=None):
+        def run(client):
+            query = self._apply_filters(client.table(table).select(columns, count=count), filters)
+            for col in _order_columns(order):
+                query = query.order(col, desc=desc)
+            if limit is not None:
+                query = query.range(offset, offset + limit - 1)
+            return query.execute()
+        res = self._run(run, retry=True)
+        return Result(res.data or [], res.count)
+
+    @_timed
+    def insert(self, table, rows):
+        res = self._run(lambda client: client.table(table).insert(rows).execute())
+        return Result(res.data or [])
+
+    @_timed
+    def upsert(self, table, rows):
+        res = self._run(lambda client: client.table(table).upsert(rows).execute(), retry=True)
+        return Result(res.data or [])
+
+    @_timed
+    def update(self, table, values, filters):
+        res = self._run(lambda client: self._apply_filters(client.table(table).update(values), filters).execute(), retry=True)
+        return Result(res.data or [])
+
+    @_timed
+    def delete(self, table, filters):
+        res = self._run(lambda client: self._apply_filters(client.table(table).delete(), filters).execute(), retry=True)
+        return Result(res.data or [])
+
+    @_timed
+    def rpc(self, name, params=None):
+        res = self._run(lambda client: client.rpc(name, params or {}).execute(), retry=True)
+        return Result(res.data)
+
+
+# --- SQLITE BACKEND ---
+_EMBED_RE = re.compile(r"^(\w+)(!inner)?\((.*)\)$")
+_SQL_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=", "ilike": "LIKE"}
+
+
+class SQLiteBackend:
+    """
+    In-process backend with the same interface as SupabaseBackend.
+    path=":memory:" gives a throwaway database; a file path gives a local replica.
+    """
+
+    def __init__(self, path=":memory:"):
+        # One connection behind a lock: SQLite serialises writers anyway, and ":memory:" is per connection
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        with self.lock:
+            self.conn.executescript(SQLITE_SCHEMA)
+            self.conn.commit()
+
+    # -- helpers --
+    def _encode(self, table, row):
+        out = {}
+        for k, v in row.items():
+            out[k] = json.dumps(v) if isinstance(v, (dict, list)) else v
+        return out
+
+    def _decode(self, table, row):
+        cols = JSON_COLUMNS.get(table, set())
+        out = dict(row)
+        for c in cols:
+            if isinstance(out.get(c), str):
+                try: out[c] = json.loads(out[c])
+                except ValueError: pass
+        return out
+
+    def _parse_columns(self, table, columns):
+        """Splits 'a, b, clients!inner(name)' into base columns and embeds."""
+        parts, depth, buf = [], 0, ""
+        for ch in columns:
+            if ch == "," and depth == 0:
+                parts.append(buf.strip()); buf = ""; continue
+            depth += ch == "("
+            depth -= ch == ")"
+            buf += ch
+        if buf.strip(): parts.append(buf.strip())
+
+        base, embeds = [], []
+        for p in parts:
+            m = _EMBED_RE.match(p)
+            if m:
+                embeds.append({"table": m.group(1), "inner": bool(m.group(2)),
+                               "columns": [c.strip() for c in m.group(3).split(",") if c.strip()]})
+            else:
+                base.append(p)
+        return base, embeds
+
+    def _column_ref(self, table, col, embeds):
+        if "." in col:
+            etable, ecol = col.split(".", 1)
+            for i, e in enumerate(embeds):
+                if e["table"] == etable:
+                    return f'e{i}."{ecol}"'
+            raise ValueError(f"Filter on {etable} requires it to be embedded in the select")
+        return f't."{col}"'
+
+    def _where(self, table, filters, embeds):
+        clauses, params = [], []
+        for op, col, val in filters:
+            if op in ("before", "after"):
+                refs = [self._column_ref(table, c, embeds) for c in col]
+                cmp = "<" if op == "before" else ">"
+                terms = []
+                for i, ref in enumerate(refs):
+                    terms.append("(" + " AND ".join([f"{r} = ?" for r in refs[:i]] + [f"{ref} {cmp} ?"]) + ")")
+                    params.extend(list(val[:i]) + [val[i]])
+                clauses.append("(" + " OR ".join(terms) + ")")
+                continue
+            ref = self._column_ref(table, col, embeds)
+            if op in ("in", "not_in"):
+                vals = list(val)
+                if not vals:
+                    clauses.append("1=0" if op == "in" else "1=1")
+                    continue
+                marks = ", ".join("?" for _ in vals)
+                clauses.append(f"{ref} {'IN' if op == 'in' else 'NOT IN'} ({marks})")
+                params.extend(vals)
+            elif op in _SQL_OPS:
+                clauses.append(f"{ref} {_SQL_OPS[op]} ?")
+                params.append(val)
+            else:
+                raise ValueError(f"Unsupported filter op: {op}")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _joins(self, table, embeds):
+        sql = ""
+        for i, e in enumerate(embeds):
+            fk = f"{e['table'][:-1]}_id"  # clients -> client_id, project_types -> project_type_id
+            kind = "JOIN" if e["inner"] else "LEFT JOIN"
+            sql += f' {kind} "{e["table"]}" e{i} ON e{i}.id = t."{fk}"'
+        return sql
+
+    def _rows_by_rowid(self, table, rowids):
+        if not rowids: return []
+        marks = ", ".join("?" for _ in rowids)
+        cur = self.conn.execute(f'SELECT * FROM "{table}" WHERE rowid IN ({marks})', rowids)
+        return [self._decode(table, r) for r in cur.fetchall()]
+
+    # -- interface --
+    @_timed
+    def select(self, table, columns="*", filters=(), order=None, desc=False, limit=None, offset=0, count=None):
+        base, embeds = self._parse_columns(table, columns)
+        sel = ["t.*" if c == "*" else f't."{c}"' for c in base]
+        for i, e in enumerate(embeds):
+            sel.append(f'e{i}.id AS "__e{i}__"')
+            for c in e["columns"]:
+                sel.append(f'e{i}."{c}" AS "__e{i}__{c}"')
+        joins = self._joins(table, embeds)
+        where, params = self._where(table, filters, embeds)
+
+        sql = f'SELECT {", ".join(sel)} FROM "{table}" t{joins}{where}'
+        if order:
+            sql += " ORDER BY " + ", ".join(f't."{c}" {"DESC" if desc else "ASC"}' for c in _order_columns(order))
+        if limit is not None:
+            sql += f" LIMIT {int(limit)} OFFSET {int(offset)}"
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+            total = None
+            if count:
+                total = self.conn.execute(f'SELECT COUNT(*) FROM "{table}" t{joins}{where}', params).fetchone()[0]
+
+        data = []
+        for r in rows:
+            row = self._decode(table, r)
+            for i, e in enumerate(embeds):
+                present = row.pop(f"__e{i}__") is not None
+                nested = {c: row.pop(f"__e{i}__{c}") for c in e["columns"]}
+                row[e["table"]] = nested if present else None
+            data.append(row)
+        return Result(data, total)
+
+    @_timed
+    def insert(self, table, rows):
+        rows = rows if isinstance(rows, list) else [rows]
+        rowids = []
+        with self.lock:
+            for row in rows:
+                enc = self._encode(table, row)
+                cols = ", ".join(f'"{c}"' for c in enc)
+                marks = ", ".join("?" for _ in enc)
+                cur = self.conn.execute(f'INSERT INTO "{table}" ({cols}) VALUES ({marks})', list(enc.values()))
+                rowids.append(cur.lastrowid)
+            self.conn.commit()
+            return Result(self._rows_by_rowid(table, rowids))
+
+    @_timed
+    def upsert(self, table, rows):
+        rows = rows if isinstance(rows, list) else [rows]
+        pk = PRIMARY_KEYS.get(table, "id")
+        rowids = []
+        with self.lock:
+            for row in rows:
+                enc = self._encode(table, row)
+                cols = ", ".join(f'"{c}"' for c in enc)
+                marks = ", ".join("?" for _ in enc)
+                sets = ", ".join(f'"{c}" = excluded."{c}"' for c in enc if c != pk) or f'"{pk}" = excluded."{pk}"'
+                self.conn.execute(
+                    f'INSERT INTO "{table}" ({cols}) VALUES ({marks}) ON CONFLICT("{pk}") DO UPDATE SET {sets}',
+                    list(enc.values()))
+                rowids.append(self.conn.execute(f'SELECT rowid FROM "{table}" WHERE "{pk}" = ?', (row[pk],)).fetchone()[0])
+            self.conn.commit()
+            return Result(self._rows_by_rowid(table, rowids))
+
+    @_timed
+    def update(self, table, values, filters):
+        enc = self._encode(table, values)
+        where, params = self._where(table, filters, [])
+        sets = ", ".join(f'"{c}" = ?' for c in enc)
+        with self.lock:
+            rowids = [r[0] for r in self.conn.execute(f'SELECT t.rowid FROM "{table}" t{where}', params).fetchall()]
+            if rowids:
+                marks = ", ".join("?" for _ in rowids)
+                self.conn.execute(f'UPDATE "{table}" SET {sets} WHERE rowid IN ({marks})', list(enc.values()) + rowids)
+                self.conn.commit()
+            return Result(self._rows_by_rowid(table, rowids))
+
+    @_timed
+    def delete(self, table, filters):
+        where, params = self._where(table, filters, [])
+        with self.lock:
+            cur = self.conn.execute(f'SELECT t.rowid AS "__rowid__", t.* FROM "{table}" t{where}', params)
+            rows = cur.fetchall()
+            if rows:
+                marks = ", ".join("?" for _ in rows)
+                self.conn.execute(f'DELETE FROM "{table}" WHERE rowid IN ({marks})', [r[0] for r in rows])
+                self.conn.commit()
+        return Result([self._decode(table, dict(zip(r.keys()[1:], tuple(r)[1:]))) for r in rows])
+
+    @_timed
+    def rpc(self, name, params=None):
+        fn = SQLITE_RPCS.get(name)
+        if fn is None:
+            raise ValueError(f"Unknown rpc: {name}")
+        with self.lock:
+            return Result(fn(self.conn, **(params or {})))
+
+
+# --- SQLITE EQUIVALENTS OF THE POSTGRES FUNCTIONS IN schema.sql ---
+def _sqlite_purchase_spend_summary(conn, top_n=5):
+    total = conn.execute("SELECT COALESCE(SUM(cost), 0) FROM supplier_purchases").fetchone()[0]
+    top = conn.execute(
+        """SELECT sp.supplier_id, s.name AS supplier_name, SUM(sp.cost) AS cost
+           FROM supplier_purchases sp JOIN suppliers s ON s.id = sp.supplier_id
+           GROUP BY sp.supplier_id, s.name ORDER BY SUM(sp.cost) DESC LIMIT ?""", (int(top_n),)).fetchall()
+    monthly = conn.execute(
+        """SELECT substr(purchase_date, 1, 7) AS month, SUM(cost) AS cost
+           FROM supplier_purchases WHERE purchase_date IS NOT NULL
+           GROUP BY 1 ORDER BY 1""").fetchall()
+    return {"total_spend": total, "top_suppliers": [dict(r) for r in top], "monthly": [dict(r) for r in monthly]}
+
+
+SQLITE_RPCS = {
+    "purchase_spend_summary": _sqlite_purchase_spend_summary,
+}
+
+
+# --- TABLE / REPOSITORY ---
+class Table:
+    """CRUD accessor for one table. `key` is the primary key column used by get/update/delete."""
+
+    def __init__(self, backend, name, key="id", order=None, desc=False, columns="*"):
+        self.backend = backend
+        self.name = name
+        self.key = key
+        self.order = order
+        self.desc = desc
+        self.columns = columns
+
+    def list(self, columns=None, filters=(), order=None, desc=None, limit=None, offset=0, count=None):
+        return self.backend.select(
+            self.name, columns or self.columns, filters,
+            order=order if order is not None else self.order,
+            desc=self.desc if desc is None else desc,
+            limit=limit, offset=offset, count=count)
+
+    def list_all(self, columns=None, filters=(), page_size=LIST_PAGE_SIZE):
+        """
+        Every matching row in key order, fetched in key-range pages: PostgREST silently caps a
+        single response (max-rows), so an unpaged list() of a large table is truncated.
+        page_size must not exceed the server's cap (a short page ends the scan).
+        """
+        rows, last = [], None
+        while True:
+            page = list(filters) + ([("gt", self.key, last)] if last is not None else [])
+            data = self.list(columns=columns, filters=page, order=self.key, desc=False, limit=page_size).data
+            rows.extend(data)
+            if len(data) < page_size:
+                return Result(rows)
+            last = data[-1][self.key]
+
+    def find(self, columns=None, **eq):
+        return self.list(columns=columns, filters=[("eq", k, v) for k, v in eq.items()])
+
+    def get(self, key_value, columns=None):
+        res = self.list(columns=columns, filters=[("eq", self.key, key_value)], limit=1)
+        return res.data[0] if res.data else None
+
+    def page(self, page, page_size, filters=(), columns=None, count="exact"):
+        """Offset pagination (1-based page). Returns (rows, total_count). Prefer keyset() for long lists."""
+        start = (page - 1) * page_size
+        res = self.list(columns=columns, filters=filters, limit=page_size, offset=start, count=count)
+        return res.data, res.count or 0
+
+    def keyset(self, page_size, cursor=None, filters=(), columns=None):
+        """
+        Keyset pagination in table order on (order column, key): page 500 costs the same as page 1.
+        cursor: None for the first page, else the cursor returned with the previous page.
+        Returns (rows, next_cursor); next_cursor is None on the last page.
+        The order column must be NOT NULL: a NULL compares with nothing, so its row would never be paged to.
+        """
+        keys = (self.order, self.key)
+        filters = list(filters)
+        if cursor is not None:
+            filters.append(("before" if self.desc else "after", keys, tuple(cursor)))
+        data = self.list(columns=columns, filters=filters, order=keys, limit=page_size + 1).data
+        rows = data[:page_size]
+        if len(data) <= page_size:
+            return rows, None
+        cursor = tuple(rows[-1][k] for k in keys)
+        if None in cursor:
+            raise ValueError(f"{self.name}: NULL in keyset column(s) {keys}; backfill them (see schema.sql)")
+        return rows, cursor
+
+    def count(self, filters=(), estimated=False):
+        """Row count; estimated=True takes Postgres' planner estimate for large results (SQLite counts exactly)."""
+        res = self.backend.select(self.name, self.key, filters, limit=1, count="estimated" if estimated else "exact")
+        return res.count or 0
+
+    def insert(self, rows):
+        return self.backend.insert(self.name, rows)
+
+    def upsert(self, rows):
+        return self.backend.upsert(self.name, rows)
+
+    def update(self, key_value, values):
+        return self.backend.update(self.name, values, [("eq", self.key, key_value)])
+
+    def update_where(self, values, filters):
+        return self.backend.update(self.name, values, filters)
+
+    def delete(self, key_value):
+        return self.backend.delete(self.name, [("eq", self.key, key_value)])
+
+    def delete_where(self, filters):
+        return self.backend.delete(self.name, filters)
+
+
+class Repository:
+    def __init__(self, backend):
+        self.backend = backend
+        self.clients = Table(backend, "clients", order="created_at", desc=True)
+        self.projects = Table(backend, "projects", order="created_at", desc=True, columns="*, clients(name)")
+        self.project_types = Table(backend, "project_types", order="type_name")
+        self.inventory = Table(backend, "inventory", order="item_name")
+        self.suppliers = Table(backend, "suppliers", order="name")
+        self.supplier_purchases = Table(backend, "supplier_purchases", order="purchase_date", desc=True)
+        self.staff = Table(backend, "staff", order="name")
+        self.staff_roles = Table(backend, "staff_roles", key="role_name")
+        self.settings = Table(backend, "settings")
+        self.users = Table(backend, "users", key="username")
+
+    def table(self, name):
+        return getattr(self, name)
+
+    def connection_metrics(self):
+        """Client pool metrics (reconnects, acquire latency), or None for backends without a pool."""
+        metrics = getattr(self.backend, "connection_metrics", None)
+        return metrics() if metrics else None
+
+    def get_settings(self, defaults):
+        row = self.settings.get(1)
+        return row if row else defaults
+
+    def purchase_spend_summary(self, top_n=5):
+        """
+        Spend aggregated in the database, so the payload stays constant-size:
+        {"total_spend": n, "top_suppliers": [{supplier_id, supplier_name, cost}], "monthly": [{month, cost}]}
+        """
+        data = self.backend.rpc("purchase_spend_summary", {"top_n": top_n}).data
+        return data or {"total_spend": 0, "top_suppliers": [], "monthly": []}
+
+
+def create_repository(secrets):
+    """
+    Builds the repository from Streamlit secrets (or any mapping).
+    DATA_BACKEND = "supabase" (default) | "sqlite"; SQLITE_PATH defaults to ":memory:".
+    DB_POOL_SIZE bounds the Supabase client pool.
+    """
+    kind = str(secrets.get("DATA_BACKEND", "supabase")).lower()
+    if kind == "sqlite":
+        return Repository(SQLiteBackend(secrets.get("SQLITE_PATH", ":memory:")))
+    return Repository(SupabaseBackend.from_credentials(
+        secrets["SUPABASE_URL"], secrets["SUPABASE_KEY"], pool_size=int(secrets.get("DB_POOL_SIZE", DEFAULT_POOL_SIZE))))
+
+
+def replicate(source, target, tables=TABLES):
+    """Copies every row of `tables` from one repository into another (e.g. Supabase -> local SQLite replica)."""
+    copied = {}
+    for name in tables:
+        rows = source.backend.select(name).data
+        if rows:
+            target.backend.upsert(name, rows)
+        copied[name] = len(rows)
+    return copied
@@ -0,0 +1,212 @@
+import bisect
+import heapq
+import re
+import threading
+
+# ---------------------------
+# TYPEAHEAD SEARCH INDEX
+# ---------------------------
+# In-memory inverted index so search boxes never hit the database. Words are
+# indexed per field:
+#     postings[field][word] -> {record keys}
+#     vocab[field]          sorted words (a prefix is a bisect range)
+#     grams[field][trigram] -> {words}   substring matches ("arma" finds "sharma")
+# Indexing words instead of records keeps memory proportional to the
+# vocabulary, which grows far slower than the record count (names repeat).
+#
+# Ranking per query word: exact word > word prefix > substring, times the
+# field weight; records matching every query word are returned best first,
+# ties broken by the shorter primary text. sync() diffs against the last
+# snapshot, so a changed row costs one re-index, not a rebuild.
+
+_SPLIT = re.compile(r"[\W_]+")
+_EMPTY = frozenset()
+_UNSET = object()
+
+EXACT, PREFIX, SUBSTRING = 3, 2, 1
+MIN_SUBSTRING = 3  # shorter query words only match word prefixes
+
+
+def tokenize(text):
+    return [t for t in _SPLIT.split(str(text or "").lower()) if t]
+
+
+def _trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, fields):
+        """fields: ((name, weight), ...); the first one is the primary (tie-break) text."""
+        self.fields = tuple(fields)
+        self.docs = {}  # key -> (label, texts)
+        self.rank = {}  # key -> tie-break (primary text length)
+        self.postings = [{} for _ in self.fields]
+        self.vocab = [[] for _ in self.fields]
+        self.grams = [{} for _ in self.fields]
+        self.token = _UNSET
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def label(self, key):
+        doc = self.docs.get(key)
+        return doc[0] if doc else None
+
+    # --- maintenance ---
+    def _add_word(self, fi, word, key):
+        posting = self.postings[fi].get(word)
+        if posting is None:
+            posting = self.postings[fi][word] = set()
+            bisect.insort(self.vocab[fi], word)
+            for g in _trigrams(word):
+                self.grams[fi].setdefault(g, set()).add(word)
+        posting.add(key)
+
+    def _remove_word(self, fi, word, key):
+        posting = self.postings[fi].get(word)
+        if posting is None:
+            return
+        posting.discard(key)
+        if not posting:
+            del self.postings[fi][word]
+            vocab = self.vocab[fi]
+            del vocab[bisect.bisect_left(vocab, word)]
+            for g in _trigrams(word):
+                words = self.grams[fi].get(g)
+                if words is not None:
+                    words.discard(word)
+                    if not words:
+                        del self.grams[fi][g]
+
+    def upsert(self, key, label, texts):
+        """texts: one string per field, in `fields` order."""
+        texts = tuple(str(t or "") for t in texts)
+        with self.lock:
+            if self.docs.get(key) == (label, texts):
+                return
+            self.remove(key)
+            self.docs[key] = (label, texts)
+            self.rank[key] = len(texts[0])
+            for fi, text in enumerate(texts):
+                for word in set(tokenize(text)):
+                    self._add_word(fi, word, key)
+
+    def remove(self, key):
+        with self.lock:
+            doc = self.docs.pop(key, None)
+            if doc is None:
+                return
+            self.rank.pop(key, None)
+            for fi, text in enumerate(doc[1]):
+                for word in set(tokenize(text)):
+                    self._remove_word(fi, word, key)
+
+    def sync(self, token, build):
+        """
+        Brings the index in line with build() -> {key: (label, texts)}.
+        build is only called when `token` (anything that changes with the source data) differs from last time.
+        """
+        with self.lock:
+            if token is self.token or (self.token is not _UNSET and token == self.token):
+                return False
+            docs = build()
+            for key in [k for k in self.docs if k not in docs]:
+                self.remove(key)
+            for key, (label, texts) in docs.items():
+                self.upsert(key, label, texts)
+            self.token = token
+            return True
+
+    # --- queries ---
+    def _groups(self, word):
+        """[(score, keys)] best first; a key's score for this word is the first group containing it."""
+        groups = []
+        for fi, (_, weight) in enumerate(self.fields):
+            post, vocab = self.postings[fi], self.vocab[fi]
+            if word in post:
+                groups.append((weight * EXACT, post[word]))
+            lo = bisect.bisect_left(vocab, word)
+            hi = bisect.bisect_left(vocab, word + "\U0010ffff")
+            prefixed = [post[w] for w in vocab[lo:hi] if w != word]
+            if prefixed:
+                groups.append((weight * PREFIX, set().union(*prefixed)))
+            if len(word) >= MIN_SUBSTRING:
+                grams = self.grams[fi]
+                sets = sorted((grams.get(g, _EMPTY) for g in _trigrams(word)), key=len)
+                inner = [post[w] for w in sets[0].intersection(*sets[1:])
+                         if word in w and not w.startswith(word)]
+                if inner:
+                    groups.append((weight * SUBSTRING, set().union(*inner)))
+        groups.sort(key=lambda g: -g[0])
+        return groups
+
+    @staticmethod
+    def _levels(groups, within=None):
+        """Disjoint (score, keys) levels, best first, computed lazily."""
+        seen = set()
+        for score, keys in groups:
+            level = (keys if within is None else within.intersection(keys)) - seen
+            if level:
+                yield score, level
+                seen |= level
+
+    def search(self, query, limit=20):
+        """[(key, score)] best first; every query word must match. limit=None returns all matches."""
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+        with self.lock:
+            per_word = [self._groups(w) for w in words]
+            if not all(per_word):
+                return []
+            if len(per_word) == 1:
+                levels = self._levels(per_word[0])
+            else:
+                # Combine each word's score levels across words with set operations,
+                # so there is no per-record Python loop even for broad queries
+                matched = [set().union(*(keys for _, keys in groups)) for groups in per_word]
+                matched.sort(key=len)
+                candidates = matched[0].intersection(*matched[1:])
+                combos = [(0, candidates)]
+                for groups in per_word:
+                    levels = list(self._levels(groups, candidates))
+                    combos = [(total + score, level & keys) for total, keys in combos for score, level in levels]
+                    combos = [c for c in combos if c[1]]
+                levels = sorted(combos, key=lambda c: -c[0])
+
+            # Fill from the best level down; only the levels we reach get ordered
+            rank = self.rank.__getitem__
+            out = []
+            for score, keys in levels:
+                need = None if limit is None else limit - len(out)
+                take = sorted(keys, key=rank) if need is None else heapq.nsmallest(need, keys, key=rank)
+                out.extend((k, score) for k in take)
+                if limit is not None and len(out) >= limit:
+                    break
+            return out
+
+
+class SearchCatalog:
+    """Several SearchIndexes (clients, projects, ...) behind one search box."""
+
+    def __init__(self, specs):
+        """specs: {kind: fields} (see SearchIndex)."""
+        self.indexes = {kind: SearchIndex(fields) for kind, fields in specs.items()}
+
+    def __getitem__(self, kind):
+        return self.indexes[kind]
+
+    def sync(self, kind, token, build):
+        return self.indexes[kind].sync(token, build)
+
+    def search(self, query, kinds=None, limit=8):
+        """{kind: [(key, label, score)]} for every kind with matches."""
+        out = {}
+        for kind in kinds or self.indexes:
+            idx = self.indexes[kind]
+            hits = idx.search(query, limit)
+            if hits:
+                out[kind] = [(key, idx.label(key), score) for key, score in hits]
+        return out
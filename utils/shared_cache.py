@@ -0,0 +1,133 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import uuid
+
+# ---------------------------
+# SHARED CACHE TIER
+# ---------------------------
+# Optional second level under utils.cache.cached, shared by every Streamlit
+# replica. Each cached function has a version number; entries are stamped with
+# the version they were fetched under. Invalidating bumps the version, so all
+# replicas drop the old value at once, and a short lease makes sure only one
+# replica refetches a key while the others wait for its result.
+#
+# SHARED_CACHE_URL (secrets):
+#   sqlite:///path/to/cache.db  (or a plain path)   replicas on one host / shared volume
+#   redis://host:6379/0                             Redis or any RESP-compatible server (needs `redis`)
+
+LEASE_SECONDS = 30
+
+
+def _digest(key):
+    return hashlib.sha256(key).hexdigest()
+
+
+class SQLiteSharedTier:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self.lock = threading.Lock()
+        self.holder = uuid.uuid4().hex
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS cache_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    name TEXT, key TEXT, version INTEGER, stored_at REAL, payload BLOB, PRIMARY KEY (name, key));
+                CREATE TABLE IF NOT EXISTS cache_leases (
+                    name TEXT, key TEXT, holder TEXT, expires_at REAL, PRIMARY KEY (name, key));
+            """)
+
+    def version(self, name):
+        with self.lock:
+            row = self.conn.execute("SELECT version FROM cache_versions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, name):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO cache_versions (name, version) VALUES (?, 1) "
+                "ON CONFLICT(name) DO UPDATE SET version = version + 1", (name,))
+            self.conn.execute("DELETE FROM cache_entries WHERE name = ?", (name,))
+            return self.conn.execute("SELECT version FROM cache_versions WHERE name = ?", (name,)).fetchone()[0]
+
+    def get(self, name, key):
+        """(version, stored_at, payload) or None."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT version, stored_at, payload FROM cache_entries WHERE name = ? AND key = ?",
+                (name, _digest(key))).fetchone()
+
+    def put(self, name, key, version, payload):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO cache_entries (name, key, version, stored_at, payload) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(name, key) DO UPDATE SET version = excluded.version, stored_at = excluded.stored_at, "
+                "payload = excluded.payload WHERE excluded.version >= cache_entries.version",
+                (name, _digest(key), version, time.time(), payload))
+
+    def acquire_lease(self, name, key, seconds=LEASE_SECONDS):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("DELETE FROM cache_leases WHERE name = ? AND key = ? AND expires_at < ?", (name, _digest(key), now))
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO cache_leases (name, key, holder, expires_at) VALUES (?, ?, ?, ?)",
+                (name, _digest(key), self.holder, now + seconds))
+            return cur.rowcount == 1
+
+    def release_lease(self, name, key):
+        with self.lock:
+            self.conn.execute("DELETE FROM cache_leases WHERE name = ? AND key = ? AND holder = ?",
+                              (name, _digest(key), self.holder))
+
+
+class RedisSharedTier:
+    def __init__(self, url, prefix="gcrm"):
+        import redis  # optional dependency, only needed when SHARED_CACHE_URL is redis://
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.holder = uuid.uuid4().hex
+
+    def _k(self, kind, name, key=None):
+        return f"{self.prefix}:{kind}:{name}" + (f":{_digest(key)}" if key is not None else "")
+
+    def version(self, name):
+        return int(self.client.get(self._k("v", name)) or 0)
+
+    def bump(self, name):
+        # Entries carry their version, so stale ones are simply never matched again
+        return int(self.client.incr(self._k("v", name)))
+
+    def get(self, name, key):
+        h = self.client.hmget(self._k("e", name, key), "version", "stored_at", "payload")
+        if h[0] is None:
+            return None
+        return int(h[0]), float(h[1]), h[2]
+
+    def put(self, name, key, version, payload):
+        k = self._k("e", name, key)
+        current = self.client.hget(k, "version")
+        if current is not None and int(current) > version:
+            return
+        self.client.hset(k, mapping={"version": version, "stored_at": time.time(), "payload": payload})
+        self.client.expire(k, 24 * 3600)
+
+    def acquire_lease(self, name, key, seconds=LEASE_SECONDS):
+        return bool(self.client.set(self._k("l", name, key), self.holder, nx=True, ex=seconds))
+
+    def release_lease(self, name, key):
+        k = self._k("l", name, key)
+        if self.client.get(k) == self.holder.encode():
+            self.client.delete(k)
+
+
+def create_shared_tier(url):
+    """Tier for SHARED_CACHE_URL, or None when unset (process-local caching only)."""
+    if not url:
+        return None
+    url = str(url)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSharedTier(url)
+    return SQLiteSharedTier(url[len("sqlite:///"):] if url.startswith("sqlite:///") else url)